@@ -1,24 +1,74 @@
 # app.py Complete Salon Platform Backend
 import os
+import io
+import csv
+import json
+import base64
+import logging
+import tempfile
+import threading
+from time import monotonic, perf_counter, sleep
+from collections import Counter, OrderedDict, namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from datetime import datetime, timedelta, date, time
 from functools import wraps
+from itertools import groupby
 from decimal import Decimal
 
-from flask import Flask, request, jsonify
+from flask import (
+    Flask,
+    Blueprint,
+    request,
+    jsonify,
+    g,
+    make_response,
+    current_app,
+    has_request_context,
+    stream_with_context,
+)
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
-from flask_bcrypt import Bcrypt
 from flask_jwt_extended import (
     JWTManager,
     create_access_token,
     get_jwt_identity,
     jwt_required,
 )
+import click
 from dotenv import load_dotenv
 from flask_cors import CORS
-from sqlalchemy import func, and_, or_
+from sqlalchemy import (
+    func,
+    and_,
+    or_,
+    false,
+    true,
+    update,
+    case,
+    extract,
+    make_url,
+    event,
+    select,
+    text,
+    bindparam,
+    create_engine,
+    union,
+)
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.dialects import mysql, sqlite
+from sqlalchemy.orm import joinedload, contains_eager, aliased
+from sqlalchemy.pool import NullPool
 from werkzeug.utils import secure_filename
 import uuid
+import weakref
+import hashlib
+import bcrypt
+
+try:
+    import redis
+except ImportError:  # optional, only needed for CATALOG_CACHE_BACKEND=redis
+    redis = None
 
 # --- Load environment ---
 load_dotenv()
@@ -32,42 +82,184 @@ DB_NAME = os.getenv("DB_NAME", "salon_platform")
 DATABASE_URL = f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
 # --- App and Config ---
-app = Flask(__name__)
-app.config["SQLALCHEMY_DATABASE_URI"] = DATABASE_URL
-app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-app.config["SQLALCHEMY_ECHO"] = os.getenv("SQLALCHEMY_ECHO", "false").lower() == "true"
-app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
-    "pool_size": int(os.getenv("SQLALCHEMY_POOL_SIZE", "10")),
-    "max_overflow": int(os.getenv("SQLALCHEMY_MAX_OVERFLOW", "20")),
-    "pool_timeout": int(os.getenv("SQLALCHEMY_POOL_TIMEOUT", "30")),
-}
-
-app.config["JWT_SECRET_KEY"] = os.getenv("JWT_SECRET_KEY", "change-me-in-production")
-app.config["JWT_ALGORITHM"] = os.getenv("JWT_ALGORITHM", "HS256")
-app.config["JWT_ACCESS_TOKEN_EXPIRES"] = timedelta(
-    hours=int(os.getenv("JWT_ACCESS_TOKEN_EXPIRES_HOURS", "8"))
-)
+# Database pool config. SQLALCHEMY_POOL_SIZE and SQLALCHEMY_MAX_OVERFLOW are the
+# connection budget for the whole server; each of the WEB_CONCURRENCY worker
+# processes gets an even share, but never fewer pooled connections than it
+# has request threads (GUNICORN_THREADS).
+SQLALCHEMY_POOL_SIZE = int(os.getenv("SQLALCHEMY_POOL_SIZE", "10"))
+SQLALCHEMY_MAX_OVERFLOW = int(os.getenv("SQLALCHEMY_MAX_OVERFLOW", "20"))
+SQLALCHEMY_POOL_TIMEOUT = int(os.getenv("SQLALCHEMY_POOL_TIMEOUT", "30"))
+SQLALCHEMY_POOL_RECYCLE = int(os.getenv("SQLALCHEMY_POOL_RECYCLE", "1800"))
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+WEB_THREADS = int(os.getenv("GUNICORN_THREADS", "1"))
 
 # File upload config
-app.config["UPLOAD_FOLDER"] = os.getenv("UPLOAD_FOLDER", "./uploads")
-app.config["MAX_CONTENT_LENGTH"] = 16 * 1024 * 1024  # 16MB max file size
 ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg", "gif"}
 
-CORS(app, resources={r"/*": {"origins": os.getenv("CORS_ALLOW_ORIGINS", "*")}})
+# Pagination config
+DEFAULT_PAGE_LIMIT = int(os.getenv("DEFAULT_PAGE_LIMIT", "50"))
+MAX_PAGE_LIMIT = int(os.getenv("MAX_PAGE_LIMIT", "200"))
+
+# Slot engine config
+SLOT_STEP_MINUTES = int(os.getenv("SLOT_STEP_MINUTES", "15"))
+SLOT_MAX_DAYS = int(os.getenv("SLOT_MAX_DAYS", "31"))
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+# Notification config
+NOTIFICATION_BATCH_SIZE = int(os.getenv("NOTIFICATION_BATCH_SIZE", "1000"))
+
+NOTIFICATION_MAX_ATTEMPTS = int(os.getenv("NOTIFICATION_MAX_ATTEMPTS", "5"))
+NOTIFICATION_RETRY_SECONDS = int(os.getenv("NOTIFICATION_RETRY_SECONDS", "30"))
+
+# Notification stream (SSE) config. Each open stream holds a server thread,
+# so only NOTIFICATION_STREAM_SLOTS streams run at once per worker.
+NOTIFICATION_STREAM_SLOTS = int(os.getenv("NOTIFICATION_STREAM_SLOTS", "2"))
+NOTIFICATION_STREAM_POLL_SECONDS = float(
+    os.getenv("NOTIFICATION_STREAM_POLL_SECONDS", "2")
+)
+NOTIFICATION_STREAM_SECONDS = int(os.getenv("NOTIFICATION_STREAM_SECONDS", "300"))
+
+# Metrics rollup config
+ROLLUP_OVERLAP = timedelta(minutes=int(os.getenv("ROLLUP_OVERLAP_MINUTES", "10")))
+
+# Catalog response cache config
+CATALOG_CACHE_BACKEND = os.getenv("CATALOG_CACHE_BACKEND", "memory")
+CATALOG_CACHE_URL = os.getenv("CATALOG_CACHE_URL", "redis://127.0.0.1:6379/0")
+CATALOG_CACHE_TTL = int(os.getenv("CATALOG_CACHE_TTL", "60"))
+CATALOG_CACHE_SIZE = int(os.getenv("CATALOG_CACHE_SIZE", "2048"))
+
+# Identity cache config
+IDENTITY_CACHE_TTL = int(os.getenv("IDENTITY_CACHE_TTL", "5"))
+IDENTITY_CACHE_SIZE = int(os.getenv("IDENTITY_CACHE_SIZE", "10000"))
+
+# Password hashing config
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_EXECUTOR = os.getenv("PASSWORD_HASH_EXECUTOR", "process")
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1)))
+PASSWORD_HASH_MAX_PENDING = int(
+    os.getenv("PASSWORD_HASH_MAX_PENDING", str(PASSWORD_HASH_WORKERS * 4))
+)
+PASSWORD_HASH_TIMEOUT = float(os.getenv("PASSWORD_HASH_TIMEOUT", "10"))
+
+# Salon settings cache config
+SETTINGS_CACHE_TTL = int(os.getenv("SETTINGS_CACHE_TTL", "300"))
+
+# Instrumentation config
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "500"))
+METRICS_DIR = os.getenv("METRICS_DIR")
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+# Probe config
+READINESS_CACHE_SECONDS = float(os.getenv("READINESS_CACHE_SECONDS", "2"))
+READINESS_TIMEOUT_SECONDS = int(os.getenv("READINESS_TIMEOUT_SECONDS", "2"))
+
+# Export config
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+# Idempotency key config
+IDEMPOTENCY_KEY_TTL = timedelta(hours=int(os.getenv("IDEMPOTENCY_KEY_TTL_HOURS", "24")))
+# An unfinished claim older than this belongs to a request that died (worker
+# killed, crash before the response was stored) and may be taken over; keep
+# it above GUNICORN_TIMEOUT so a live request is never run twice
+IDEMPOTENCY_LEASE = timedelta(seconds=int(os.getenv("IDEMPOTENCY_LEASE_SECONDS", "60")))
 
 # --- Extensions ---
-db = SQLAlchemy(app)
-migrate = Migrate(app, db)
-bcrypt = Bcrypt(app)
-jwt = JWTManager(app)
+db = SQLAlchemy()
+migrate = Migrate()
+jwt = JWTManager()
+
+# Every route, error handler and CLI command is registered on this blueprint
+api = Blueprint("api", __name__, cli_group=None)
+
+
+def pool_options(database_uri):
+    """Per-worker engine pool settings for a database URI"""
+    if make_url(database_uri).get_backend_name() == "sqlite":
+        return {}
+    return {
+        "pool_size": max(WEB_THREADS, SQLALCHEMY_POOL_SIZE // WEB_CONCURRENCY, 1),
+        "max_overflow": SQLALCHEMY_MAX_OVERFLOW // WEB_CONCURRENCY,
+        "pool_timeout": SQLALCHEMY_POOL_TIMEOUT,
+        "pool_recycle": SQLALCHEMY_POOL_RECYCLE,
+        "pool_pre_ping": True,
+    }
+
+
+def serialize_sqlite_transactions(engine):
+    """Make every SQLite transaction take the database write lock up front.
+
+    SQLite ignores SELECT ... FOR UPDATE, and pysqlite only opens a
+    transaction at the first write, so two requests could both pass a
+    locked availability or stock check. BEGIN IMMEDIATE serializes them the
+    way the row locks do on MySQL; SQLite allows one writer anyway.
+    """
+
+    @event.listens_for(engine, "connect")
+    def disable_driver_transactions(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def begin_immediate(conn):
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+
 
-# Create upload folder if it doesn't exist
-os.makedirs(app.config["UPLOAD_FOLDER"], exist_ok=True)
+# Engines of every app built in this process. A preloading server forks
+# after create_app; children must not reuse connections opened by the parent.
+fork_engines = weakref.WeakSet()
+os.register_at_fork(
+    after_in_child=lambda: [engine.dispose(close=False) for engine in fork_engines]
+)
+
+
+def create_app(config=None):
+    """Build the Flask app; config is a mapping that overrides the env defaults"""
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = DATABASE_URL
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    app.config["SQLALCHEMY_ECHO"] = (
+        os.getenv("SQLALCHEMY_ECHO", "false").lower() == "true"
+    )
+
+    app.config["JWT_SECRET_KEY"] = os.getenv(
+        "JWT_SECRET_KEY", "change-me-in-production"
+    )
+    app.config["JWT_ALGORITHM"] = os.getenv("JWT_ALGORITHM", "HS256")
+    app.config["JWT_ACCESS_TOKEN_EXPIRES"] = timedelta(
+        hours=int(os.getenv("JWT_ACCESS_TOKEN_EXPIRES_HOURS", "8"))
+    )
+
+    app.config["UPLOAD_FOLDER"] = os.getenv("UPLOAD_FOLDER", "./uploads")
+    app.config["MAX_CONTENT_LENGTH"] = 16 * 1024 * 1024  # 16MB max file size
+
+    app.config.update(config or {})
+    app.config.setdefault(
+        "SQLALCHEMY_ENGINE_OPTIONS",
+        pool_options(app.config["SQLALCHEMY_DATABASE_URI"]),
+    )
+
+    CORS(app, resources={r"/*": {"origins": os.getenv("CORS_ALLOW_ORIGINS", "*")}})
+    db.init_app(app)
+    migrate.init_app(app, db)
+    jwt.init_app(app)
+    app.register_blueprint(api)
+
+    with app.app_context():
+        engines = list(db.engines.values())
+    for engine in engines:
+        instrument_engine(engine)
+        if engine.dialect.name == "sqlite":
+            serialize_sqlite_transactions(engine)
+        fork_engines.add(engine)
+
+    # Create upload folder if it doesn't exist
+    os.makedirs(app.config["UPLOAD_FOLDER"], exist_ok=True)
+    return app
 
 
 # ==================== MODELS ====================
 class User(db.Model):
     __tablename__ = "users"
+    __table_args__ = (db.Index("idx_users_created_at", "created_at"),)
     user_id = db.Column(db.Integer, primary_key=True)
     full_name = db.Column(db.String(100), nullable=False)
     phone = db.Column(db.String(20), unique=True, nullable=False)
@@ -109,6 +301,10 @@ class Auth(db.Model):
 
 class Salon(db.Model):
     __tablename__ = "salons"
+    __table_args__ = (
+        db.Index("idx_salons_status", "status", "salon_id"),
+        db.Index("idx_salons_owner", "owner_id"),
+    )
     salon_id = db.Column(db.Integer, primary_key=True)
     owner_id = db.Column(db.Integer, db.ForeignKey("users.user_id"), nullable=False)
     name = db.Column(db.String(100), nullable=False)
@@ -117,19 +313,29 @@ class Salon(db.Model):
     status = db.Column(db.Enum("pending", "active", "blocked"), default="pending")
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    owner = db.relationship("User")
+    rating = db.relationship("SalonRating", uselist=False)
+
 
 class SalonSettings(db.Model):
     __tablename__ = "salon_settings"
+    __table_args__ = (db.UniqueConstraint("salon_id", name="unique_salon_setting"),)
     setting_id = db.Column(db.Integer, primary_key=True)
     salon_id = db.Column(db.Integer, db.ForeignKey("salons.salon_id"), nullable=False)
     timezone = db.Column(db.String(50), default="UTC")
     tax_rate = db.Column(db.Numeric(5, 2), default=0)
     cancellation_policy = db.Column(db.Text)
     auto_complete_after = db.Column(db.Integer, default=24)
+    loyalty_points_per_dollar = db.Column(db.Integer, default=1)
+    loyalty_redemption_rate = db.Column(db.Numeric(6, 4), default=0.01)
 
 
 class Staff(db.Model):
     __tablename__ = "staff"
+    __table_args__ = (
+        db.Index("idx_staff_salon_active", "salon_id", "is_active"),
+        db.Index("idx_staff_user", "user_id"),
+    )
     staff_id = db.Column(db.Integer, primary_key=True)
     salon_id = db.Column(db.Integer, db.ForeignKey("salons.salon_id"), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey("users.user_id"), nullable=False)
@@ -137,9 +343,16 @@ class Staff(db.Model):
     specialization = db.Column(db.Text)
     is_active = db.Column(db.Boolean, default=True)
 
+    user = db.relationship("User")
+    salon = db.relationship("Salon")
+    rating = db.relationship("StaffRating", uselist=False)
+
 
 class StaffAvailability(db.Model):
     __tablename__ = "staff_availability"
+    __table_args__ = (
+        db.Index("idx_staff_availability_staff", "staff_id", "is_available"),
+    )
     availability_id = db.Column(db.Integer, primary_key=True)
     staff_id = db.Column(db.Integer, db.ForeignKey("staff.staff_id"), nullable=False)
     day_of_week = db.Column(
@@ -152,8 +365,32 @@ class StaffAvailability(db.Model):
     is_available = db.Column(db.Boolean, default=True)
 
 
+class StaffTimeOff(db.Model):
+    __tablename__ = "staff_time_off"
+    __table_args__ = (db.Index("idx_staff_timeoff_staff", "staff_id"),)
+    timeoff_id = db.Column(db.Integer, primary_key=True)
+    staff_id = db.Column(db.Integer, db.ForeignKey("staff.staff_id"), nullable=False)
+    start_datetime = db.Column(db.DateTime, nullable=False)
+    end_datetime = db.Column(db.DateTime, nullable=False)
+    reason = db.Column(db.String(255))
+    approved_by = db.Column(db.Integer, db.ForeignKey("users.user_id"))
+    status = db.Column(
+        db.Enum("pending", "approved", "rejected"), default="pending"
+    )
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
 class ServiceCategory(db.Model):
     __tablename__ = "service_categories"
+    __table_args__ = (
+        # service search; ngram so partial words and CJK names match
+        db.Index(
+            "ft_service_categories_name",
+            "name",
+            mysql_prefix="FULLTEXT",
+            mysql_with_parser="ngram",
+        ),
+    )
     category_id = db.Column(db.Integer, primary_key=True)
     main_category_id = db.Column(db.Integer)
     salon_id = db.Column(db.Integer, db.ForeignKey("salons.salon_id"))
@@ -162,6 +399,18 @@ class ServiceCategory(db.Model):
 
 class Service(db.Model):
     __tablename__ = "services"
+    __table_args__ = (
+        db.Index("idx_services_salon_active", "salon_id", "is_active", "service_id"),
+        # service search: text match and price-ordered keyset
+        db.Index(
+            "ft_services_name_description",
+            "custom_name",
+            "description",
+            mysql_prefix="FULLTEXT",
+            mysql_with_parser="ngram",
+        ),
+        db.Index("idx_services_active_price", "is_active", "price", "service_id"),
+    )
     service_id = db.Column(db.Integer, primary_key=True)
     salon_id = db.Column(db.Integer, db.ForeignKey("salons.salon_id"), nullable=False)
     category_id = db.Column(
@@ -173,9 +422,12 @@ class Service(db.Model):
     description = db.Column(db.Text)
     is_active = db.Column(db.Boolean, default=True)
 
+    category = db.relationship("ServiceCategory")
+
 
 class StaffService(db.Model):
     __tablename__ = "staff_service"
+    __table_args__ = (db.Index("idx_staff_service_service", "service_id"),)
     staff_service_id = db.Column(db.Integer, primary_key=True)
     staff_id = db.Column(db.Integer, db.ForeignKey("staff.staff_id"), nullable=False)
     service_id = db.Column(
@@ -185,6 +437,21 @@ class StaffService(db.Model):
 
 class Appointment(db.Model):
     __tablename__ = "appointments"
+    __table_args__ = (
+        # staff_schedule, slot engine and booking conflict checks
+        db.Index(
+            "idx_appointments_staff_time_status", "staff_id", "scheduled_time", "status"
+        ),
+        # my_appointments keyset order
+        db.Index("idx_appointments_user_time", "user_id", "scheduled_time"),
+        # customer_history
+        db.Index(
+            "idx_appointments_salon_user_time", "salon_id", "user_id", "scheduled_time"
+        ),
+        # metrics rollup day buckets and watermark
+        db.Index("idx_appointments_scheduled_time", "scheduled_time"),
+        db.Index("idx_appointments_updated_at", "updated_at"),
+    )
     appointment_id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.user_id"), nullable=False)
     salon_id = db.Column(db.Integer, db.ForeignKey("salons.salon_id"), nullable=False)
@@ -203,9 +470,30 @@ class Appointment(db.Model):
         db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
     )
 
+    user = db.relationship("User")
+    salon = db.relationship("Salon")
+    staff = db.relationship("Staff")
+    service = db.relationship("Service")
+
+
+class AppointmentReschedule(db.Model):
+    # One row per reschedule, so the metrics rollup also recomputes the day
+    # a booking moved away from
+    __tablename__ = "appointment_reschedules"
+    reschedule_id = db.Column(db.Integer, primary_key=True)
+    appointment_id = db.Column(
+        db.Integer, db.ForeignKey("appointments.appointment_id"), nullable=False
+    )
+    previous_scheduled_time = db.Column(db.DateTime, nullable=False)
+    scheduled_time = db.Column(db.DateTime, nullable=False)
+    rescheduled_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
 
 class AppointmentService(db.Model):
     __tablename__ = "appointment_services"
+    __table_args__ = (
+        db.UniqueConstraint("appointment_id", "service_id", name="unique_appt_service"),
+    )
     id = db.Column(db.Integer, primary_key=True)
     appointment_id = db.Column(
         db.Integer, db.ForeignKey("appointments.appointment_id"), nullable=False
@@ -219,6 +507,9 @@ class AppointmentService(db.Model):
 
 class Product(db.Model):
     __tablename__ = "products"
+    __table_args__ = (
+        db.Index("idx_products_salon_active", "salon_id", "is_active", "product_id"),
+    )
     product_id = db.Column(db.Integer, primary_key=True)
     salon_id = db.Column(db.Integer, db.ForeignKey("salons.salon_id"), nullable=False)
     name = db.Column(db.String(100), nullable=False)
@@ -232,6 +523,9 @@ class Product(db.Model):
 
 class Cart(db.Model):
     __tablename__ = "carts"
+    __table_args__ = (
+        db.Index("idx_carts_user_status_salon", "user_id", "status", "salon_id"),
+    )
     cart_id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.user_id"), nullable=False)
     salon_id = db.Column(db.Integer, db.ForeignKey("salons.salon_id"), nullable=False)
@@ -242,16 +536,26 @@ class Cart(db.Model):
 class CartItem(db.Model):
     __tablename__ = "cart_items"
     item_id = db.Column(db.Integer, primary_key=True)
-    cart_id = db.Column(db.Integer, db.ForeignKey("carts.cart_id"), nullable=False)
+    cart_id = db.Column(
+        db.Integer, db.ForeignKey("carts.cart_id"), nullable=False, index=True
+    )
     product_id = db.Column(db.Integer, db.ForeignKey("products.product_id"))
     service_id = db.Column(db.Integer, db.ForeignKey("services.service_id"))
     quantity = db.Column(db.Integer, default=1)
     price = db.Column(db.Numeric(10, 2), nullable=False)
     type = db.Column(db.Enum("product", "service"), nullable=False)
 
+    product = db.relationship("Product")
+    service = db.relationship("Service")
+
 
 class Payment(db.Model):
     __tablename__ = "payments"
+    __table_args__ = (
+        db.Index("idx_payments_status_created", "payment_status", "created_at"),
+        # payments export salon filter, appointment arm
+        db.Index("idx_payments_appointment", "appointment_id"),
+    )
     payment_id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.user_id"), nullable=False)
     amount = db.Column(db.Numeric(10, 2), nullable=False)
@@ -267,6 +571,10 @@ class Payment(db.Model):
 
 class Order(db.Model):
     __tablename__ = "orders"
+    __table_args__ = (
+        db.Index("idx_orders_status_created", "payment_status", "created_at"),
+        db.Index("idx_orders_salon_status", "salon_id", "payment_status"),
+    )
     order_id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.user_id"), nullable=False)
     salon_id = db.Column(db.Integer, db.ForeignKey("salons.salon_id"), nullable=False)
@@ -294,6 +602,9 @@ class OrderItem(db.Model):
 
 class Loyalty(db.Model):
     __tablename__ = "loyalty"
+    __table_args__ = (
+        db.UniqueConstraint("user_id", "salon_id", name="unique_loyalty_user_salon"),
+    )
     loyalty_id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.user_id"), nullable=False)
     salon_id = db.Column(db.Integer, db.ForeignKey("salons.salon_id"), nullable=False)
@@ -301,9 +612,30 @@ class Loyalty(db.Model):
     lifetime_points = db.Column(db.Integer, default=0)
     last_earned = db.Column(db.DateTime)
 
+    salon = db.relationship("Salon")
+
+
+# Append-only ledger; each loyalty balance is the sum of its rows
+class LoyaltyTransaction(db.Model):
+    __tablename__ = "loyalty_transactions"
+    __table_args__ = (
+        db.Index("idx_loyalty_txn_user_salon", "user_id", "salon_id", "created_at"),
+    )
+    transaction_id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.user_id"), nullable=False)
+    salon_id = db.Column(db.Integer, db.ForeignKey("salons.salon_id"), nullable=False)
+    points = db.Column(db.Integer, nullable=False)
+    reason = db.Column(
+        db.Enum("appointment", "purchase", "redemption", "adjustment"), nullable=False
+    )
+    # appointment_id or order_id, depending on reason
+    reference_id = db.Column(db.Integer)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
 
 class Review(db.Model):
     __tablename__ = "reviews"
+    __table_args__ = (db.Index("idx_reviews_salon_created", "salon_id", "created_at"),)
     review_id = db.Column(db.Integer, primary_key=True)
     appointment_id = db.Column(
         db.Integer, db.ForeignKey("appointments.appointment_id"), nullable=False
@@ -317,9 +649,37 @@ class Review(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     responded_at = db.Column(db.DateTime)
 
+    user = db.relationship("User")
+
+
+class RatingAggregate:
+    """Review count, rating sum and per-star histogram kept in step with reviews"""
+
+    average_rating = db.Column(db.Numeric(3, 2), nullable=False, default=0)
+    review_count = db.Column(db.Integer, nullable=False, default=0)
+    rating_sum = db.Column(db.Integer, nullable=False, default=0)
+    stars_1 = db.Column(db.Integer, nullable=False, default=0)
+    stars_2 = db.Column(db.Integer, nullable=False, default=0)
+    stars_3 = db.Column(db.Integer, nullable=False, default=0)
+    stars_4 = db.Column(db.Integer, nullable=False, default=0)
+    stars_5 = db.Column(db.Integer, nullable=False, default=0)
+
+
+class SalonRating(RatingAggregate, db.Model):
+    __tablename__ = "salon_ratings"
+    salon_id = db.Column(
+        db.Integer, db.ForeignKey("salons.salon_id"), primary_key=True
+    )
+
+
+class StaffRating(RatingAggregate, db.Model):
+    __tablename__ = "staff_ratings"
+    staff_id = db.Column(db.Integer, db.ForeignKey("staff.staff_id"), primary_key=True)
+
 
 class Notification(db.Model):
     __tablename__ = "notifications"
+    __table_args__ = (db.Index("idx_notifications_user_sent", "user_id", "sent_at"),)
     notification_id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.user_id"), nullable=False)
     type = db.Column(
@@ -332,8 +692,54 @@ class Notification(db.Model):
     scheduled_for = db.Column(db.DateTime)
 
 
+# Unread notifications per user, kept in step with every notification write;
+# version changes on each write so streams can detect new activity cheaply
+class NotificationCounter(db.Model):
+    __tablename__ = "notification_counters"
+    user_id = db.Column(db.Integer, db.ForeignKey("users.user_id"), primary_key=True)
+    unread = db.Column(db.Integer, nullable=False, default=0)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+
+class NotificationQueue(db.Model):
+    __tablename__ = "notification_queue"
+    __table_args__ = (db.Index("idx_notif_queue_due", "sent", "scheduled_for"),)
+    queue_id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(
+        db.Integer, db.ForeignKey("users.user_id"), nullable=False, index=True
+    )
+    type = db.Column(
+        db.Enum("reminder", "promotion", "status_update", "discount"),
+        nullable=False,
+        default="status_update",
+    )
+    message = db.Column(db.Text, nullable=False)
+    delivery_method = db.Column(db.Enum("email", "sms", "push"), default="email")
+    scheduled_for = db.Column(db.DateTime, nullable=False, index=True)
+    sent = db.Column(db.Boolean, default=False)
+    attempts = db.Column(db.Integer, default=0)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class IdempotencyKey(db.Model):
+    __tablename__ = "idempotency_keys"
+    user_id = db.Column(db.Integer, db.ForeignKey("users.user_id"), primary_key=True)
+    endpoint = db.Column(db.String(100), primary_key=True)
+    idempotency_key = db.Column(db.String(255), primary_key=True)
+    request_hash = db.Column(db.String(64), nullable=False)
+    # NULL until the first request finishes
+    status_code = db.Column(db.Integer)
+    response_body = db.Column(db.Text)
+    content_type = db.Column(db.String(100))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+
 class Promotion(db.Model):
     __tablename__ = "promotions"
+    __table_args__ = (
+        db.Index("idx_promotions_salon_active", "salon_id", "is_active", "valid_until"),
+    )
     promotion_id = db.Column(db.Integer, primary_key=True)
     salon_id = db.Column(db.Integer, db.ForeignKey("salons.salon_id"), nullable=False)
     title = db.Column(db.String(200), nullable=False)
@@ -344,9 +750,461 @@ class Promotion(db.Model):
     is_active = db.Column(db.Boolean, default=True)
 
 
+class DailySalonMetrics(db.Model):
+    __tablename__ = "daily_salon_metrics"
+    day = db.Column(db.Date, primary_key=True)
+    salon_id = db.Column(
+        db.Integer, db.ForeignKey("salons.salon_id"), primary_key=True
+    )
+    revenue = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    orders = db.Column(db.Integer, nullable=False, default=0)
+    appointments_booked = db.Column(db.Integer, nullable=False, default=0)
+    appointments_completed = db.Column(db.Integer, nullable=False, default=0)
+    appointments_cancelled = db.Column(db.Integer, nullable=False, default=0)
+    appointments_no_show = db.Column(db.Integer, nullable=False, default=0)
+    # from the loyalty_transactions ledger
+    points_issued = db.Column(db.Integer, nullable=False, default=0)
+    points_redeemed = db.Column(db.Integer, nullable=False, default=0)
+
+
+class DailyHourlyBookings(db.Model):
+    __tablename__ = "daily_hourly_bookings"
+    day = db.Column(db.Date, primary_key=True)
+    salon_id = db.Column(
+        db.Integer, db.ForeignKey("salons.salon_id"), primary_key=True
+    )
+    hour = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    appointments = db.Column(db.Integer, nullable=False, default=0)
+
+
+class DailyPlatformMetrics(db.Model):
+    __tablename__ = "daily_platform_metrics"
+    day = db.Column(db.Date, primary_key=True)
+    new_users = db.Column(db.Integer, nullable=False, default=0)
+    payments = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+
+
+class CustomerVisitStats(db.Model):
+    __tablename__ = "customer_visit_stats"
+    user_id = db.Column(db.Integer, db.ForeignKey("users.user_id"), primary_key=True)
+    visits = db.Column(db.Integer, nullable=False, default=0)
+    first_visit = db.Column(db.DateTime)
+    last_visit = db.Column(db.DateTime)
+
+
+class RollupWatermark(db.Model):
+    __tablename__ = "rollup_watermarks"
+    name = db.Column(db.String(50), primary_key=True)
+    last_value = db.Column(db.DateTime)
+    refreshed_at = db.Column(db.DateTime)
+
+
 # ==================== HELPER FUNCTIONS ====================
 
 
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after ttl seconds"""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            value, expires_at = entry
+            if expires_at < monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class MemoryCacheBackend:
+    """Catalog cache backend kept in this worker process.
+
+    Invalidation only reaches this worker; the others serve their copy
+    until it expires. Use the redis backend to invalidate every worker.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self._entries = TTLCache(maxsize, ttl)
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        return self._entries.get(key)
+
+    def set(self, key, value):
+        self._entries.set(key, value)
+
+    def counter(self, key):
+        with self._lock:
+            return self._counters.get(key, 0)
+
+    def incr(self, key):
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+
+
+class RedisCacheBackend:
+    """Catalog cache backend shared by all workers through Redis"""
+
+    def __init__(self, url, ttl):
+        if redis is None:
+            raise RuntimeError("CATALOG_CACHE_BACKEND=redis requires the redis package")
+        self._client = redis.Redis.from_url(url)
+        self.ttl = ttl
+
+    def get(self, key):
+        return self._client.get(key)
+
+    def set(self, key, value):
+        self._client.set(key, value, ex=self.ttl)
+
+    def counter(self, key):
+        return int(self._client.get(key) or 0)
+
+    def incr(self, key):
+        self._client.incr(key)
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when the password hashing pool has no free slot"""
+
+
+class PasswordHasher:
+    """Runs bcrypt on a bounded executor instead of the request thread.
+
+    executor is "process", "thread" (bcrypt releases the GIL) or "inline".
+    At most max_pending hashes wait per worker; beyond that callers get
+    PasswordHasherBusy, which the API answers with 429.
+    """
+
+    def __init__(self, rounds, executor, workers, max_pending, timeout):
+        self.rounds = rounds
+        self.executor = executor
+        self.workers = workers
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._pool = None
+        self._pool_pid = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self):
+        # Pools do not survive a fork, so each server worker builds its own
+        with self._lock:
+            if self._pool is None or self._pool_pid != os.getpid():
+                if self.executor == "process":
+                    self._pool = ProcessPoolExecutor(self.workers)
+                else:
+                    self._pool = ThreadPoolExecutor(
+                        self.workers, thread_name_prefix="password-hash"
+                    )
+                self._pool_pid = os.getpid()
+            return self._pool
+
+    def _run(self, fn, *args):
+        if self.executor == "inline":
+            return fn(*args)
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHasherBusy()
+        try:
+            future = self._get_pool().submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        # The slot stays taken until the job itself finishes (or is
+        # cancelled), not when this caller stops waiting for it
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise PasswordHasherBusy()
+
+    def hash(self, password):
+        salt = bcrypt.gensalt(self.rounds)
+        return self._run(bcrypt.hashpw, password.encode(), salt).decode()
+
+    def verify(self, password, pw_hash):
+        return self._run(bcrypt.checkpw, password.encode(), pw_hash.encode())
+
+    def needs_rehash(self, pw_hash):
+        """True when a stored hash was made with a different cost"""
+        try:
+            return int(pw_hash.split("$")[2]) != self.rounds
+        except (IndexError, ValueError):
+            return True
+
+
+password_hasher = PasswordHasher(
+    BCRYPT_ROUNDS,
+    PASSWORD_HASH_EXECUTOR,
+    PASSWORD_HASH_WORKERS,
+    PASSWORD_HASH_MAX_PENDING,
+    PASSWORD_HASH_TIMEOUT,
+)
+
+
+# Resolved identity of the authenticated user, shared by all protected routes
+Principal = namedtuple(
+    "Principal", ["user_id", "role", "staff_id", "staff_salon_ids", "salon_ids"]
+)
+
+identity_cache = TTLCache(IDENTITY_CACHE_SIZE, IDENTITY_CACHE_TTL)
+
+
+def load_principal(user_id):
+    """Get the cached principal for a user, loading it on a miss.
+
+    A hit costs no database round trip. Changes are dropped at once in the
+    worker that made them; other workers see them once their entry expires
+    after IDENTITY_CACHE_TTL seconds.
+    """
+    principal = identity_cache.get(user_id)
+    if principal is not None:
+        return principal
+
+    user = User.query.get(user_id)
+    if not user:
+        return None
+
+    staff_rows = Staff.query.filter_by(user_id=user_id).all()
+    owned = db.session.query(Salon.salon_id).filter_by(owner_id=user_id).all()
+
+    principal = Principal(
+        user_id=user.user_id,
+        role=user.user_role,
+        staff_id=staff_rows[0].staff_id if staff_rows else None,
+        staff_salon_ids=frozenset(st.salon_id for st in staff_rows),
+        salon_ids=frozenset(salon_id for (salon_id,) in owned),
+    )
+    identity_cache.set(user_id, principal)
+    return principal
+
+
+def invalidate_identity(user_id):
+    """Drop a cached principal after its role, staff or salon data changes"""
+    identity_cache.pop(int(user_id))
+
+
+if CATALOG_CACHE_BACKEND == "redis":
+    catalog_cache = RedisCacheBackend(CATALOG_CACHE_URL, CATALOG_CACHE_TTL)
+else:
+    catalog_cache = MemoryCacheBackend(CATALOG_CACHE_SIZE, CATALOG_CACHE_TTL)
+
+
+def catalog_cached(fn):
+    """Cache a public per-salon GET response and answer If-None-Match with 304.
+
+    Keys include a per-salon version, so invalidate_catalog() drops every
+    cached page for that salon at once.
+    """
+
+    @wraps(fn)
+    def wrapper(salon_id, *args, **kwargs):
+        try:
+            version = catalog_cache.counter(f"catalog-version:{salon_id}")
+            key = f"catalog:{salon_id}:{version}:{request.full_path}"
+            cached = catalog_cache.get(key)
+        except Exception:
+            # Cache outages fall back to the database
+            return fn(salon_id, *args, **kwargs)
+
+        if cached is None:
+            response = make_response(fn(salon_id, *args, **kwargs))
+            if response.status_code != 200:
+                return response
+            body = response.get_data()
+            cached = hashlib.sha1(body).hexdigest().encode() + b"\n" + body
+            try:
+                catalog_cache.set(key, cached)
+            except Exception:
+                pass
+
+        etag, body = cached.split(b"\n", 1)
+        response = make_response(body)
+        response.mimetype = "application/json"
+        response.set_etag(etag.decode())
+        response.headers["Cache-Control"] = "no-cache"
+        return response.make_conditional(request)
+
+    return wrapper
+
+
+def invalidate_catalog(*salon_ids):
+    """Drop cached catalog responses after a salon's public data changes"""
+    for salon_id in salon_ids:
+        try:
+            catalog_cache.incr(f"catalog-version:{salon_id}")
+        except Exception:
+            pass
+
+
+def claim_idempotency_key(uid, key, request_hash):
+    """Insert the key for this request, or return the row already holding it"""
+    entry = IdempotencyKey(
+        user_id=uid,
+        endpoint=request.endpoint,
+        idempotency_key=key,
+        request_hash=request_hash,
+    )
+    db.session.add(entry)
+    try:
+        db.session.commit()
+        return entry, None
+    except IntegrityError:
+        db.session.rollback()
+
+    existing = IdempotencyKey.query.get((uid, request.endpoint, key))
+    now = datetime.utcnow()
+    if existing and (
+        existing.created_at < now - IDEMPOTENCY_KEY_TTL
+        or (existing.status_code is None and existing.created_at < now - IDEMPOTENCY_LEASE)
+    ):
+        # Expired but not purged yet, or claimed by a request that never
+        # finished; treat the key as unused. Matching created_at means only
+        # one of several concurrent retries removes this claim.
+        IdempotencyKey.query.filter_by(
+            user_id=uid,
+            endpoint=request.endpoint,
+            idempotency_key=key,
+            created_at=existing.created_at,
+        ).delete(synchronize_session=False)
+        db.session.commit()
+        db.session.expunge(existing)
+        return claim_idempotency_key(uid, key, request_hash)
+    return None, existing
+
+
+def idempotent(fn):
+    """Honor an Idempotency-Key header on a state-changing JWT route.
+
+    The first request claims the key and stores its response; retries with
+    the same key and body replay that response without re-running the
+    handler. Work an unsuccessful handler left in the session is rolled
+    back; server errors release the key so the client can retry, and a
+    claim left unfinished for IDEMPOTENCY_LEASE_SECONDS is taken over.
+    """
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get("Idempotency-Key")
+        if not key:
+            return fn(*args, **kwargs)
+        if len(key) > 255:
+            return jsonify(error="Idempotency-Key must be at most 255 characters"), 400
+
+        uid = int(get_jwt_identity())
+        request_hash = hashlib.sha256(
+            request.method.encode() + request.path.encode() + request.get_data()
+        ).hexdigest()
+        entry, existing = claim_idempotency_key(uid, key, request_hash)
+        if existing is not None:
+            if existing.request_hash != request_hash:
+                return (
+                    jsonify(error="Idempotency-Key was used with a different request"),
+                    422,
+                )
+            if existing.status_code is None:
+                return (
+                    jsonify(error="A request with this Idempotency-Key is in progress"),
+                    409,
+                )
+            response = current_app.response_class(
+                existing.response_body,
+                status=existing.status_code,
+                content_type=existing.content_type,
+            )
+            response.headers["Idempotent-Replayed"] = "true"
+            return response
+        if entry is None:
+            # Lost a race with a request that released the key
+            return jsonify(error="A request with this Idempotency-Key is in progress"), 409
+
+        try:
+            response = make_response(fn(*args, **kwargs))
+        except Exception:
+            db.session.rollback()
+            db.session.delete(entry)
+            db.session.commit()
+            raise
+
+        if not 200 <= response.status_code < 300:
+            # Only a successful handler's pending work is committed along
+            # with the stored response
+            db.session.rollback()
+        if response.status_code >= 500:
+            db.session.delete(entry)
+        else:
+            entry.status_code = response.status_code
+            entry.response_body = response.get_data(as_text=True)
+            entry.content_type = response.content_type
+        db.session.commit()
+        return response
+
+    return wrapper
+
+
+def current_principal():
+    """Principal for the current JWT, memoized on flask.g"""
+    if "principal" not in g:
+        g.principal = load_principal(int(get_jwt_identity()))
+    return g.principal
+
+
+def merge_intervals(intervals):
+    """Merge (start, end) intervals into a sorted list of disjoint intervals"""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def subtract_intervals(windows, busy):
+    """Remove busy intervals from windows (both merged and sorted)"""
+    free = []
+    i = 0
+    for start, end in windows:
+        while i < len(busy) and busy[i][1] <= start:
+            i += 1
+        cursor = start
+        j = i
+        while j < len(busy) and busy[j][0] < end:
+            if busy[j][0] > cursor:
+                free.append((cursor, busy[j][0]))
+            cursor = max(cursor, busy[j][1])
+            j += 1
+        if cursor < end:
+            free.append((cursor, end))
+    return free
+
+
 def json_required():
     """Validate JSON content type"""
     if not request.is_json:
@@ -361,9 +1219,8 @@ def require_roles(*roles):
         @wraps(fn)
         @jwt_required()
         def wrapper(*args, **kwargs):
-            uid = int(get_jwt_identity())
-            user = User.query.get(uid)
-            if not user or user.user_role not in roles:
+            principal = current_principal()
+            if not principal or principal.role not in roles:
                 return jsonify(error="Forbidden: Insufficient permissions"), 403
             return fn(*args, **kwargs)
 
@@ -382,29 +1239,288 @@ def get_user_salon(user_id):
     return Salon.query.filter_by(owner_id=user_id).first()
 
 
-def award_loyalty_points(user_id, salon_id, amount):
-    """Award loyalty points based on purchase amount"""
-    settings = SalonSettings.query.filter_by(salon_id=salon_id).first()
-    points_per_dollar = settings.loyalty_points_per_dollar if settings else 1
+def encode_cursor(values):
+    """Encode keyset values into an opaque cursor string"""
+    raw = json.dumps(
+        [
+            v.isoformat()
+            if isinstance(v, datetime)
+            else str(v) if isinstance(v, Decimal) else v
+            for v in values
+        ]
+    )
+    return base64.urlsafe_b64encode(raw.encode()).decode()
 
-    points_earned = int(float(amount) * points_per_dollar)
 
-    loyalty = Loyalty.query.filter_by(user_id=user_id, salon_id=salon_id).first()
-    if not loyalty:
-        loyalty = Loyalty(
-            user_id=user_id, salon_id=salon_id, points=0, lifetime_points=0
+def decode_cursor(cursor, columns):
+    """Decode a cursor string back into values matching the keyset columns"""
+    values = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+    if not isinstance(values, list) or len(values) != len(columns):
+        raise ValueError("cursor does not match ordering")
+
+    decoded = []
+    for col, value in zip(columns, values):
+        if isinstance(col.type, db.DateTime):
+            value = datetime.fromisoformat(value)
+        elif isinstance(col.type, db.Numeric):
+            value = Decimal(value)
+        decoded.append(value)
+    return decoded
+
+
+def keyset_page(query, columns, descending=False, key=None):
+    """Paginate a query by keyset using ?limit= and ?cursor= args.
+
+    columns must uniquely order the rows (end with the primary key); key
+    extracts their values from a row when they are not plain attributes.
+    Returns (rows, next_cursor, error_response).
+    """
+    try:
+        limit = int(request.args.get("limit", DEFAULT_PAGE_LIMIT))
+    except ValueError:
+        return None, None, (jsonify(error="limit must be an integer"), 400)
+    limit = max(1, min(limit, MAX_PAGE_LIMIT))
+
+    cursor = request.args.get("cursor")
+    if cursor:
+        try:
+            values = decode_cursor(cursor, columns)
+        except (ValueError, TypeError):
+            return None, None, (jsonify(error="Invalid cursor"), 400)
+
+        # (a, b) > (x, y)  ==>  a > x OR (a = x AND b > y)
+        conditions = []
+        for i, col in enumerate(columns):
+            prefix = [columns[j] == values[j] for j in range(i)]
+            step = col < values[i] if descending else col > values[i]
+            conditions.append(and_(*prefix, step))
+        query = query.filter(or_(*conditions))
+
+    order = [c.desc() if descending else c.asc() for c in columns]
+    rows = query.order_by(*order).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        if key:
+            next_cursor = encode_cursor(key(last))
+        else:
+            next_cursor = encode_cursor([getattr(last, c.key) for c in columns])
+
+    return rows, next_cursor, None
+
+
+def date_range_args(max_days=SLOT_MAX_DAYS):
+    """Parse ?from= and ?to= (YYYY-MM-DD, inclusive; ?date= is a one-day range).
+
+    Defaults to today. Returns (start_date, end_date, error_response).
+    """
+    try:
+        start_date = datetime.strptime(
+            request.args.get("from", request.args.get("date", date.today().isoformat())),
+            "%Y-%m-%d",
+        ).date()
+        end_date = datetime.strptime(
+            request.args.get("to", start_date.isoformat()), "%Y-%m-%d"
+        ).date()
+    except ValueError:
+        return None, None, (jsonify(error="from and to must be YYYY-MM-DD"), 400)
+
+    if end_date < start_date:
+        return None, None, (jsonify(error="to must not be before from"), 400)
+    if (end_date - start_date).days >= max_days:
+        return None, None, (
+            jsonify(error=f"Date range cannot exceed {max_days} days"),
+            400,
         )
-        db.session.add(loyalty)
+    return start_date, end_date, None
 
-    loyalty.points += points_earned
-    loyalty.lifetime_points += points_earned
-    loyalty.last_earned = datetime.utcnow()
 
+LoyaltySettings = namedtuple("LoyaltySettings", ["points_per_dollar", "redemption_rate"])
+
+settings_cache = TTLCache(4096, SETTINGS_CACHE_TTL)
+
+
+def salon_loyalty_settings(salon_id):
+    """Loyalty earn and redemption rates for a salon, cached per worker"""
+    cached = settings_cache.get(salon_id)
+    if cached is not None:
+        return cached
+
+    settings = SalonSettings.query.filter_by(salon_id=salon_id).first()
+    per_dollar = settings.loyalty_points_per_dollar if settings else None
+    rate = settings.loyalty_redemption_rate if settings else None
+    cached = LoyaltySettings(
+        points_per_dollar=per_dollar if per_dollar is not None else 1,
+        redemption_rate=float(rate) if rate is not None else 0.01,
+    )
+    settings_cache.set(salon_id, cached)
+    return cached
+
+
+def loyalty_upsert(user_id, salon_id, points, now):
+    """INSERT ... ON DUPLICATE KEY UPDATE adding points to a loyalty balance"""
+    table = Loyalty.__table__
+    values = dict(
+        user_id=user_id,
+        salon_id=salon_id,
+        points=points,
+        lifetime_points=points,
+        last_earned=now,
+    )
+    increments = dict(
+        points=table.c.points + points,
+        lifetime_points=table.c.lifetime_points + points,
+        last_earned=now,
+    )
+    if db.session.get_bind().dialect.name == "mysql":
+        return mysql.insert(table).values(**values).on_duplicate_key_update(**increments)
+    # SQLite (local development) spells the same upsert ON CONFLICT
+    return (
+        sqlite.insert(table)
+        .values(**values)
+        .on_conflict_do_update(index_elements=["user_id", "salon_id"], set_=increments)
+    )
+
+
+def award_loyalty_points(user_id, salon_id, amount, reason, reference_id=None):
+    """Award loyalty points based on purchase amount"""
+    points_earned = int(
+        float(amount) * salon_loyalty_settings(salon_id).points_per_dollar
+    )
+    if points_earned <= 0:
+        return 0
+
+    now = datetime.utcnow()
+    db.session.execute(loyalty_upsert(user_id, salon_id, points_earned, now))
+    db.session.add(
+        LoyaltyTransaction(
+            user_id=user_id,
+            salon_id=salon_id,
+            points=points_earned,
+            reason=reason,
+            reference_id=reference_id,
+            created_at=now,
+        )
+    )
     return points_earned
 
 
+def redeem_loyalty_points(user_id, salon_id, points):
+    """Deduct points if the balance covers them; returns the ledger entry or None"""
+    result = db.session.execute(
+        update(Loyalty)
+        .where(
+            Loyalty.user_id == user_id,
+            Loyalty.salon_id == salon_id,
+            Loyalty.points >= points,
+        )
+        .values(points=Loyalty.points - points)
+        .execution_options(synchronize_session=False)
+    )
+    if not result.rowcount:
+        return None
+
+    entry = LoyaltyTransaction(
+        user_id=user_id, salon_id=salon_id, points=-points, reason="redemption"
+    )
+    db.session.add(entry)
+    return entry
+
+
+def reserve_stock(quantities):
+    """Decrement stock for {product_id: quantity} in one conditional UPDATE
+
+    Returns False when any product lacks stock; rows that did match are
+    already decremented, so the caller must roll back.
+    """
+    if not quantities:
+        return True
+    qty = case(quantities, value=Product.product_id)
+    result = db.session.execute(
+        update(Product)
+        .where(Product.product_id.in_(list(quantities)), Product.stock >= qty)
+        .values(stock=Product.stock - qty)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == len(quantities)
+
+
+def record_rating(model, key_column, key, rating):
+    """Add one rating to a salon or staff aggregate with a single UPDATE"""
+    star = getattr(model, f"stars_{rating}")
+    stmt = (
+        update(model)
+        .where(key_column == key)
+        .ordered_values(
+            # MySQL applies SET left to right, so derive the average first
+            (
+                model.average_rating,
+                (model.rating_sum + rating) * 1.0 / (model.review_count + 1),
+            ),
+            (model.review_count, model.review_count + 1),
+            (model.rating_sum, model.rating_sum + rating),
+            (star, star + 1),
+        )
+    )
+    if db.session.execute(stmt).rowcount:
+        return
+
+    try:
+        with db.session.begin_nested():
+            db.session.add(
+                model(
+                    **{
+                        key_column.key: key,
+                        "average_rating": rating,
+                        "review_count": 1,
+                        "rating_sum": rating,
+                        star.key: 1,
+                    }
+                )
+            )
+    except IntegrityError:
+        # Another transaction created the row first
+        db.session.execute(stmt)
+
+
+def rating_summary(agg):
+    """Serialize a rating aggregate (or None) for API responses"""
+    count = agg.review_count if agg else 0
+    return {
+        "average_rating": round(agg.rating_sum / count, 2) if count else 0,
+        "review_count": count,
+        "histogram": {
+            str(n): (getattr(agg, f"stars_{n}") or 0) if agg else 0
+            for n in range(1, 6)
+        },
+    }
+
+
+def enqueue_notification(user_id, notification_type, message, scheduled_for=None):
+    """Queue a notification for the worker; committed with the caller's transaction"""
+    entry = NotificationQueue(
+        user_id=user_id,
+        type=notification_type,
+        message=message,
+        scheduled_for=scheduled_for or datetime.utcnow(),
+        sent=False,
+        attempts=0,
+    )
+    db.session.add(entry)
+    return entry
+
+
 def send_notification(user_id, notification_type, message, scheduled_for=None):
-    """Create a notification for a user"""
+    """Create a notification for a user, or queue it if scheduled for later"""
+    if scheduled_for and scheduled_for > datetime.utcnow():
+        entry = enqueue_notification(
+            user_id, notification_type, message, scheduled_for=scheduled_for
+        )
+        db.session.commit()
+        return entry
+
     notification = Notification(
         user_id=user_id,
         type=notification_type,
@@ -412,20 +1528,424 @@ def send_notification(user_id, notification_type, message, scheduled_for=None):
         scheduled_for=scheduled_for,
     )
     db.session.add(notification)
+    db.session.execute(unread_counter_upsert({user_id: 1}))
     db.session.commit()
     return notification
 
 
+def send_bulk_notifications(user_ids, notification_type, message, scheduled_for=None):
+    """Create the same notification for many users with multi-row inserts.
+
+    Rows are inserted in chunks of NOTIFICATION_BATCH_SIZE inside the
+    caller's transaction; the caller commits. Returns the number of rows.
+    """
+    now = datetime.utcnow()
+    stmt = Notification.__table__.insert()
+    created = 0
+
+    for i in range(0, len(user_ids), NOTIFICATION_BATCH_SIZE):
+        chunk = user_ids[i : i + NOTIFICATION_BATCH_SIZE]
+        db.session.execute(
+            stmt,
+            [
+                {
+                    "user_id": user_id,
+                    "type": notification_type,
+                    "message": message,
+                    "is_read": False,
+                    "sent_at": now,
+                    "scheduled_for": scheduled_for,
+                }
+                for user_id in chunk
+            ],
+        )
+        db.session.execute(unread_counter_upsert(Counter(chunk)))
+        created += len(chunk)
+
+    return created
+
+
+def unread_counter_upsert(counts):
+    """Multi-row upsert adding {user_id: new unread} to the unread counters"""
+    table = NotificationCounter.__table__
+    # Sorted so concurrent bulk sends lock counter rows in the same order
+    rows = [
+        dict(user_id=user_id, unread=n, version=1)
+        for user_id, n in sorted(counts.items())
+    ]
+    if db.session.get_bind().dialect.name == "mysql":
+        stmt = mysql.insert(table).values(rows)
+        return stmt.on_duplicate_key_update(
+            unread=table.c.unread + stmt.inserted.unread,
+            version=table.c.version + 1,
+        )
+    stmt = sqlite.insert(table).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=["user_id"],
+        set_=dict(
+            unread=table.c.unread + stmt.excluded.unread,
+            version=table.c.version + 1,
+        ),
+    )
+
+
+def mark_notifications_read(user_id, *criteria):
+    """Mark a user's unread notifications matching criteria read in one UPDATE.
+
+    The counter drops by the rows actually changed, so concurrent or repeated
+    calls never count a notification twice. Returns that number.
+    """
+    result = db.session.execute(
+        update(Notification)
+        .where(
+            Notification.user_id == user_id,
+            Notification.is_read == false(),
+            *criteria,
+        )
+        .values(is_read=True)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount:
+        db.session.execute(
+            update(NotificationCounter)
+            .where(NotificationCounter.user_id == user_id)
+            .values(
+                unread=NotificationCounter.unread - result.rowcount,
+                version=NotificationCounter.version + 1,
+            )
+        )
+    return result.rowcount
+
+
+def unread_count(user_id):
+    """Unread notifications of a user (no counter row yet means none)"""
+    counter = db.session.get(NotificationCounter, user_id)
+    return counter.unread if counter else 0
+
+
+# ==================== INSTRUMENTATION ====================
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+slow_query_log = logging.getLogger("slow_query")
+readiness_log = logging.getLogger("readiness")
+metrics_log = logging.getLogger("metrics")
+
+
+class RequestMetrics:
+    """Per-route latency histograms plus DB query count and SQL time.
+
+    With a directory set, each worker process also writes its totals to
+    <directory>/<pid>.json (at most once a second) and collect() sums every
+    file, so one scrape covers all workers of the server.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        self._series = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._flushed_at = 0.0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def observe(self, method, route, status, seconds, queries, db_seconds):
+        key = (method, route, str(status))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {
+                    "count": 0,
+                    "sum": 0.0,
+                    "buckets": [0] * len(LATENCY_BUCKETS),
+                    "queries": 0,
+                    "db_seconds": 0.0,
+                }
+            series["count"] += 1
+            series["sum"] += seconds
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    series["buckets"][i] += 1
+            series["queries"] += queries
+            series["db_seconds"] += db_seconds
+            due = self.directory and monotonic() - self._flushed_at >= 1
+            if due:
+                self._flushed_at = monotonic()
+        if due:
+            self.flush(wait=False)
+
+    def snapshot(self):
+        with self._lock:
+            return [
+                [list(key), dict(series, buckets=list(series["buckets"]))]
+                for key, series in self._series.items()
+            ]
+
+    def flush(self, wait=True):
+        """Write this worker's file; a failed write is logged, never raised.
+
+        One thread writes at a time. With wait=False a flush already in
+        progress is enough and the call returns straight away.
+        """
+        if not self._flush_lock.acquire(blocking=wait):
+            return
+        tmp = None
+        try:
+            rows = self.snapshot()
+            fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(rows, f)
+            os.replace(tmp, os.path.join(self.directory, f"{os.getpid()}.json"))
+            tmp = None
+        except OSError:
+            metrics_log.exception("could not write metrics to %s", self.directory)
+        finally:
+            if tmp:
+                try:
+                    os.remove(tmp)
+                except OSError:
+                    pass
+            self._flush_lock.release()
+
+    def collect(self):
+        """Series for this process, or summed over all workers' files"""
+        if not self.directory:
+            return self.snapshot()
+        self.flush()
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            metrics_log.exception("could not read metrics from %s", self.directory)
+            return self.snapshot()
+        merged = {}
+        for name in names:
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    rows = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for key, series in rows:
+                total = merged.get(tuple(key))
+                if total is None:
+                    merged[tuple(key)] = series
+                    continue
+                for field in ("count", "sum", "queries", "db_seconds"):
+                    total[field] += series[field]
+                total["buckets"] = [
+                    a + b for a, b in zip(total["buckets"], series["buckets"])
+                ]
+        return [[list(key), series] for key, series in merged.items()]
+
+
+def render_metrics(rows):
+    """Prometheus text exposition for collected request metrics"""
+    lines = [
+        "# HELP http_request_duration_seconds Request latency by route",
+        "# TYPE http_request_duration_seconds histogram",
+    ]
+    counters = [
+        "# HELP http_request_db_queries_total SQL statements executed by route",
+        "# TYPE http_request_db_queries_total counter",
+    ]
+    db_time = [
+        "# HELP http_request_db_seconds_total Time spent in SQL by route",
+        "# TYPE http_request_db_seconds_total counter",
+    ]
+    for (method, route, status), series in sorted(rows, key=lambda r: r[0]):
+        labels = f'method="{method}",route="{route}",status="{status}"'
+        name = "http_request_duration_seconds"
+        for bound, count in zip(LATENCY_BUCKETS, series["buckets"]):
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {series["count"]}')
+        lines.append(f"{name}_sum{{{labels}}} {series['sum']:.6f}")
+        lines.append(f"{name}_count{{{labels}}} {series['count']}")
+        counters.append(
+            f"http_request_db_queries_total{{{labels}}} {series['queries']}"
+        )
+        db_time.append(
+            f"http_request_db_seconds_total{{{labels}}} {series['db_seconds']:.6f}"
+        )
+    return "\n".join(lines + counters + db_time) + "\n"
+
+
+request_metrics = RequestMetrics(METRICS_DIR)
+
+
+def current_route():
+    """Route pattern (not the raw path) of the request being served"""
+    if not has_request_context():
+        return None
+    return request.url_rule.rule if request.url_rule else "unmatched"
+
+
+def instrument_engine(engine):
+    """Count queries and SQL time per request and log slow statements"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info["query_started"] = perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def record_query_time(conn, cursor, statement, parameters, context, executemany):
+        elapsed = perf_counter() - conn.info.pop("query_started", perf_counter())
+        if has_request_context() and "request_started" in g:
+            g.db_queries += 1
+            g.db_seconds += elapsed
+        if SLOW_QUERY_MS > 0 and elapsed * 1000 >= SLOW_QUERY_MS:
+            slow_query_log.warning(
+                "%.1f ms on %s: %s", elapsed * 1000, current_route() or "-", statement
+            )
+
+
+@api.before_app_request
+def start_request_timer():
+    g.request_started = perf_counter()
+    g.db_queries = 0
+    g.db_seconds = 0.0
+
+
+@api.after_app_request
+def record_request_metrics(response):
+    if "request_started" not in g:
+        return response
+    elapsed = perf_counter() - g.request_started
+    request_metrics.observe(
+        request.method,
+        current_route(),
+        response.status_code,
+        elapsed,
+        g.db_queries,
+        g.db_seconds,
+    )
+    response.headers.add(
+        "Server-Timing",
+        f'db;dur={g.db_seconds * 1000:.1f};desc="{g.db_queries} queries"',
+    )
+    response.headers.add("Server-Timing", f"app;dur={elapsed * 1000:.1f}")
+    return response
+
+
+@api.get("/metrics")
+def metrics():
+    """Prometheus metrics: route latency histograms, query counts, SQL time"""
+    expected = f"Bearer {METRICS_TOKEN}"
+    if METRICS_TOKEN and request.headers.get("Authorization") != expected:
+        return jsonify(error="Forbidden"), 403
+    return current_app.response_class(
+        render_metrics(request_metrics.collect()),
+        content_type="text/plain; version=0.0.4",
+    )
+
+
+class ReadinessProbe:
+    """Rate-limited SELECT 1 for /readyz.
+
+    The ping runs on a separate unpooled connection with short connect and
+    read timeouts, so a probe never waits behind requests for a pooled
+    connection. Results are reused for `ttl` seconds and only one thread per
+    worker pings at a time; the others get the last result.
+    """
+
+    def __init__(self, ttl, timeout):
+        self.ttl = ttl
+        self.timeout = timeout
+        self._engines = {}
+        self._lock = threading.Lock()
+        self._result = None
+        self._checked_at = None
+
+    def _get_engine(self, url):
+        engine = self._engines.get(url)
+        if engine is None:
+            if url.get_backend_name() == "mysql":
+                connect_args = {
+                    "connect_timeout": self.timeout,
+                    "read_timeout": self.timeout,
+                    "write_timeout": self.timeout,
+                }
+            elif url.get_backend_name() == "sqlite":
+                connect_args = {"timeout": self.timeout}
+            else:
+                connect_args = {}
+            engine = create_engine(url, poolclass=NullPool, connect_args=connect_args)
+            self._engines[url] = engine
+        return engine
+
+    def _fresh(self):
+        return self._result and monotonic() - self._checked_at < self.ttl
+
+    def check(self, url):
+        """Return (error or None, checked_at datetime) of the latest ping"""
+        if self._fresh():
+            return self._result
+        if not self._lock.acquire(timeout=self.timeout):
+            return self._result or ("readiness probe timed out", datetime.utcnow())
+        try:
+            if self._fresh():
+                return self._result
+            try:
+                with self._get_engine(url).connect() as conn:
+                    conn.exec_driver_sql("SELECT 1")
+                error = None
+            except SQLAlchemyError as e:
+                readiness_log.warning("database ping failed: %s", e)
+                error = "unavailable"
+            self._result = (error, datetime.utcnow())
+            self._checked_at = monotonic()
+            return self._result
+        finally:
+            self._lock.release()
+
+
+readiness_probe = ReadinessProbe(READINESS_CACHE_SECONDS, READINESS_TIMEOUT_SECONDS)
+
+
+def pool_status():
+    """Checked-out and overflow counts of this worker's connection pool"""
+    pool = db.engine.pool
+    status = {"pool": type(pool).__name__}
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        counter = getattr(pool, name, None)
+        if callable(counter):
+            status[name] = counter()
+    max_overflow = current_app.config["SQLALCHEMY_ENGINE_OPTIONS"].get("max_overflow")
+    if "checkedout" in status and max_overflow is not None:
+        status["max_overflow"] = max_overflow
+        status["saturated"] = status["checkedout"] >= status["size"] + max_overflow
+    return status
+
+
+@api.get("/livez")
+def livez():
+    """Liveness probe: the worker answers; never touches the database"""
+    return jsonify(status="ok", pid=os.getpid(), **pool_status())
+
+
+@api.get("/readyz")
+def readyz():
+    """Readiness probe: cached, rate-limited SELECT 1 plus pool usage"""
+    error, checked_at = readiness_probe.check(db.engine.url)
+    body = {
+        "status": "error" if error else "ok",
+        "database": error or "ok",
+        "checked_at": checked_at.isoformat(),
+        **pool_status(),
+    }
+    return jsonify(body), 503 if error else 200
+
+
 # ==================== AUTHENTICATION ENDPOINTS ====================
 
 
-@app.get("/health")
+@api.get("/health")
 def health():
     """Health check endpoint"""
     return jsonify(status="ok", timestamp=datetime.utcnow().isoformat())
 
 
-@app.post("/auth/signup")
+@api.post("/auth/signup")
 def signup():
     """User registration - Criteria: Auth #1"""
     err = json_required()
@@ -452,7 +1972,7 @@ def signup():
         return jsonify(error="Invalid user role"), 400
 
     # Hash password
-    pw_hash = bcrypt.generate_password_hash(data["password"]).decode()
+    pw_hash = password_hasher.hash(data["password"])
 
     # Create user
     user = User(
@@ -487,7 +2007,7 @@ def signup():
     )
 
 
-@app.post("/auth/login")
+@api.post("/auth/login")
 def login():
     """User login - Criteria: Auth #2"""
     err = json_required()
@@ -500,9 +2020,16 @@ def login():
         return jsonify(error="Email and password required"), 400
 
     auth = Auth.query.filter_by(email=data["email"]).first()
-    if not auth or not bcrypt.check_password_hash(auth.password_hash, data["password"]):
+    if not auth or not password_hasher.verify(data["password"], auth.password_hash):
         return jsonify(error="Invalid credentials"), 401
 
+    # Upgrade hashes made with an older BCRYPT_ROUNDS while we have the password
+    if password_hasher.needs_rehash(auth.password_hash):
+        try:
+            auth.password_hash = password_hasher.hash(data["password"])
+        except PasswordHasherBusy:
+            pass
+
     # Get user details
     user = User.query.get(auth.user_id)
 
@@ -530,7 +2057,7 @@ def login():
     )
 
 
-@app.get("/auth/me")
+@api.get("/auth/me")
 @jwt_required()
 def get_current_user():
     """Get current user profile"""
@@ -551,20 +2078,39 @@ def get_current_user():
 # ==================== SALON MANAGEMENT ====================
 
 
-@app.get("/salons")
+@api.get("/salons")
 def list_salons():
     """Browse available salons - Criteria: Auth #5"""
     status_filter = request.args.get("status", "active")
+    sort = request.args.get("sort")
 
-    query = Salon.query
+    query = Salon.query.options(joinedload(Salon.owner))
     if status_filter:
         query = query.filter_by(status=status_filter)
 
-    salons = query.all()
+    if sort == "rating":
+        rating_key = func.coalesce(SalonRating.average_rating, 0)
+        salons, next_cursor, err = keyset_page(
+            query.outerjoin(SalonRating).options(contains_eager(Salon.rating)),
+            [rating_key, Salon.salon_id],
+            descending=True,
+            key=lambda s: [
+                s.rating.average_rating if s.rating else Decimal(0),
+                s.salon_id,
+            ],
+        )
+    elif sort:
+        return jsonify(error="sort must be 'rating'"), 400
+    else:
+        salons, next_cursor, err = keyset_page(
+            query.options(joinedload(Salon.rating)), [Salon.salon_id]
+        )
+    if err:
+        return err
 
     result = []
     for s in salons:
-        owner = User.query.get(s.owner_id)
+        owner = s.owner
         result.append(
             {
                 "salon_id": s.salon_id,
@@ -573,14 +2119,15 @@ def list_salons():
                 "description": s.description,
                 "status": s.status,
                 "owner_name": owner.full_name if owner else None,
+                "rating": rating_summary(s.rating),
                 "created_at": s.created_at.isoformat() if s.created_at else None,
             }
         )
 
-    return jsonify(salons=result, count=len(result))
+    return jsonify(salons=result, count=len(result), next_cursor=next_cursor)
 
 
-@app.post("/salons")
+@api.post("/salons")
 @require_roles("owner")
 def create_salon():
     """Register salon - Criteria: Auth #3"""
@@ -614,6 +2161,7 @@ def create_salon():
     )
     db.session.add(settings)
     db.session.commit()
+    invalidate_identity(uid)
 
     return (
         jsonify(
@@ -626,7 +2174,7 @@ def create_salon():
     )
 
 
-@app.patch("/salons/<int:salon_id>/approve")
+@api.patch("/salons/<int:salon_id>/approve")
 @require_roles("admin")
 def approve_salon(salon_id):
     """Admin approve salon - Criteria: Auth #4"""
@@ -640,6 +2188,7 @@ def approve_salon(salon_id):
 
     salon.status = new_status
     db.session.commit()
+    invalidate_catalog(salon_id)
 
     # Notify owner
     # send_notification(
@@ -653,7 +2202,8 @@ def approve_salon(salon_id):
     )
 
 
-@app.get("/salons/<int:salon_id>")
+@api.get("/salons/<int:salon_id>")
+@catalog_cached
 def get_salon(salon_id):
     """Get salon details"""
     salon = Salon.query.get_or_404(salon_id)
@@ -665,6 +2215,7 @@ def get_salon(salon_id):
         address=salon.address,
         description=salon.description,
         status=salon.status,
+        rating=rating_summary(salon.rating),
         settings={
             "timezone": settings.timezone if settings else "UTC",
             "tax_rate": float(settings.tax_rate) if settings else 0,
@@ -673,7 +2224,7 @@ def get_salon(salon_id):
     )
 
 
-@app.patch("/salons/<int:salon_id>/settings")
+@api.patch("/salons/<int:salon_id>/settings")
 @require_roles("owner")
 def update_salon_settings(salon_id):
     """Configure loyalty rewards - Criteria: Loyalty #6"""
@@ -702,6 +2253,8 @@ def update_salon_settings(salon_id):
         settings.loyalty_redemption_rate = data["loyalty_redemption_rate"]
 
     db.session.commit()
+    settings_cache.pop(salon_id)
+    invalidate_catalog(salon_id)
 
     return jsonify(message="Settings updated successfully")
 
@@ -709,14 +2262,19 @@ def update_salon_settings(salon_id):
 # ==================== STAFF MANAGEMENT ====================
 
 
-@app.get("/salons/<int:salon_id>/staff")
+@api.get("/salons/<int:salon_id>/staff")
+@catalog_cached
 def list_staff(salon_id):
     """View available barbers - Criteria: Booking #1"""
-    staff_list = Staff.query.filter_by(salon_id=salon_id, is_active=True).all()
+    staff_list = (
+        Staff.query.options(joinedload(Staff.user), joinedload(Staff.rating))
+        .filter_by(salon_id=salon_id, is_active=True)
+        .all()
+    )
 
     result = []
     for st in staff_list:
-        user = User.query.get(st.user_id)
+        user = st.user
         result.append(
             {
                 "staff_id": st.staff_id,
@@ -725,13 +2283,14 @@ def list_staff(salon_id):
                 "role": st.role,
                 "specialization": st.specialization,
                 "is_active": st.is_active,
+                "rating": rating_summary(st.rating),
             }
         )
 
     return jsonify(staff=result, count=len(result))
 
 
-@app.post("/salons/<int:salon_id>/staff")
+@api.post("/salons/<int:salon_id>/staff")
 @require_roles("owner")
 def add_staff(salon_id):
     """Add staff member to salon"""
@@ -765,11 +2324,13 @@ def add_staff(salon_id):
     )
     db.session.add(staff)
     db.session.commit()
+    invalidate_identity(staff.user_id)
+    invalidate_catalog(salon_id)
 
     return jsonify(staff_id=staff.staff_id, message="Staff added successfully"), 201
 
 
-@app.patch("/staff/<int:staff_id>/assign")
+@api.patch("/staff/<int:staff_id>/assign")
 @require_roles("owner")
 def assign_staff_to_salon(staff_id):
     """Assign existing staff to salon"""
@@ -790,9 +2351,12 @@ def assign_staff_to_salon(staff_id):
     staff = Staff.query.get_or_404(staff_id)
 
     # Assign to salon
+    previous_salon_id = staff.salon_id
     staff.salon_id = salon_id
     staff.is_active = True
     db.session.commit()
+    invalidate_identity(staff.user_id)
+    invalidate_catalog(previous_salon_id, salon_id)
 
     return jsonify(
         message=f"Staff assigned to {salon.name}",
@@ -801,7 +2365,7 @@ def assign_staff_to_salon(staff_id):
     )
 
 
-@app.get("/staff/<int:staff_id>/availability")
+@api.get("/staff/<int:staff_id>/availability")
 def staff_availability(staff_id):
     """View staff availability - Criteria: Booking #1"""
     slots = StaffAvailability.query.filter_by(
@@ -823,7 +2387,7 @@ def staff_availability(staff_id):
     )
 
 
-@app.post("/staff/<int:staff_id>/availability")
+@api.post("/staff/<int:staff_id>/availability")
 @require_roles("staff", "owner")
 def add_staff_availability(staff_id):
     """Add availability slot"""
@@ -839,148 +2403,705 @@ def add_staff_availability(staff_id):
     data = request.get_json()
     required = ["day_of_week", "start_time", "end_time"]
 
-    for field in required:
-        if field not in data:
-            return jsonify(error=f"Missing {field}"), 400
+    for field in required:
+        if field not in data:
+            return jsonify(error=f"Missing {field}"), 400
+
+    try:
+        start = datetime.strptime(data["start_time"], "%H:%M").time()
+        end = datetime.strptime(data["end_time"], "%H:%M").time()
+    except ValueError:
+        return jsonify(error="Time format must be HH:MM"), 400
+
+    availability = StaffAvailability(
+        staff_id=staff_id,
+        day_of_week=data["day_of_week"],
+        start_time=start,
+        end_time=end,
+        is_available=data.get("is_available", True),
+    )
+    db.session.add(availability)
+    db.session.commit()
+
+    return (
+        jsonify(
+            availability_id=availability.availability_id, message="Availability added"
+        ),
+        201,
+    )
+
+
+@api.patch("/staff/availability/<int:availability_id>")
+@require_roles("staff", "owner")
+def update_staff_availability(availability_id):
+    """Block/unblock time slots - Criteria: Booking #5"""
+    uid = int(get_jwt_identity())
+    availability = StaffAvailability.query.get_or_404(availability_id)
+    staff = Staff.query.get(availability.staff_id)
+
+    # Verify authorization
+    if staff.user_id != uid:
+        salon = Salon.query.get(staff.salon_id)
+        if not salon or salon.owner_id != uid:
+            return jsonify(error="Unauthorized"), 403
+
+    data = request.get_json()
+
+    if "is_available" in data:
+        availability.is_available = data["is_available"]
+
+    if "start_time" in data:
+        try:
+            availability.start_time = datetime.strptime(
+                data["start_time"], "%H:%M"
+            ).time()
+        except ValueError:
+            return jsonify(error="Invalid start_time format"), 400
+
+    if "end_time" in data:
+        try:
+            availability.end_time = datetime.strptime(data["end_time"], "%H:%M").time()
+        except ValueError:
+            return jsonify(error="Invalid end_time format"), 400
+
+    db.session.commit()
+
+    return jsonify(message="Availability updated")
+
+
+def parse_availability_template(entries):
+    """Validate a weekly availability template for one staff member.
+
+    Returns ({(day, start, end): is_available}, errors); errors are
+    (index, message) pairs. Windows on the same day must not overlap.
+    """
+    rows = {}
+    errors = []
+    by_day = {}
+    for index, entry in enumerate(entries):
+        if not isinstance(entry, dict):
+            errors.append((index, "must be an object"))
+            continue
+        day = entry.get("day_of_week")
+        if day not in WEEKDAYS:
+            errors.append((index, "day_of_week must be a weekday name"))
+            continue
+        try:
+            start = datetime.strptime(entry["start_time"], "%H:%M").time()
+            end = datetime.strptime(entry["end_time"], "%H:%M").time()
+        except (KeyError, TypeError, ValueError):
+            errors.append((index, "start_time and end_time must be HH:MM"))
+            continue
+        if end <= start:
+            errors.append((index, "end_time must be after start_time"))
+            continue
+        is_available = entry.get("is_available", True)
+        if not isinstance(is_available, bool):
+            errors.append((index, "is_available must be a boolean"))
+            continue
+        by_day.setdefault(day, []).append((start, end, index))
+        rows[(day, start, end)] = is_available
+
+    for windows in by_day.values():
+        windows.sort()
+        for (_, prev_end, prev_index), (start, _, index) in zip(windows, windows[1:]):
+            if start < prev_end:
+                errors.append((index, f"overlaps entry {prev_index}"))
+    return rows, sorted(errors)
+
+
+@api.put("/salons/<int:salon_id>/staff/availability")
+@require_roles("owner")
+def bulk_staff_availability(salon_id):
+    """Replace the weekly availability of many staff members at once"""
+    # {"staff": [{"staff_id": 1, "availability": [{"day_of_week": "Monday",
+    # "start_time": "09:00", "end_time": "17:00"}, ...]}, ...]}
+    # Each listed staff member ends up with exactly their template. Rows are
+    # matched on (day, start, end) so unchanged slots keep their ids, and the
+    # whole request is applied in one transaction or not at all.
+    err = json_required()
+    if err:
+        return err
+
+    if salon_id not in g.principal.salon_ids:
+        return jsonify(error="Not your salon"), 403
+
+    data = request.get_json()
+    if not isinstance(data, dict):
+        return jsonify(error="Body must be a JSON object with a staff list"), 400
+    staff_entries = data.get("staff")
+    if not isinstance(staff_entries, list) or not staff_entries:
+        return jsonify(error="staff must be a non-empty list"), 400
+
+    templates = {}
+    errors = []
+    for entry in staff_entries:
+        staff_id = entry.get("staff_id") if isinstance(entry, dict) else None
+        availability = entry.get("availability") if staff_id else None
+        if not isinstance(staff_id, int) or not isinstance(availability, list):
+            errors.append(
+                {"staff_id": staff_id, "error": "staff_id and availability required"}
+            )
+            continue
+        if staff_id in templates:
+            errors.append({"staff_id": staff_id, "error": "staff_id listed twice"})
+            continue
+        templates[staff_id], row_errors = parse_availability_template(availability)
+        errors.extend(
+            {"staff_id": staff_id, "index": index, "error": message}
+            for index, message in row_errors
+        )
+
+    # Locking the staff rows serializes concurrent template writes per staff
+    staff_ids = {
+        staff_id
+        for (staff_id,) in db.session.query(Staff.staff_id)
+        .filter(Staff.salon_id == salon_id, Staff.staff_id.in_(list(templates)))
+        .with_for_update()
+    }
+    errors.extend(
+        {"staff_id": staff_id, "error": "Not staff at this salon"}
+        for staff_id in templates
+        if staff_id not in staff_ids
+    )
+    if errors:
+        db.session.rollback()
+        return jsonify(error="Invalid availability template", errors=errors), 400
+
+    existing = StaffAvailability.query.filter(
+        StaffAvailability.staff_id.in_(staff_ids)
+    ).all()
+    matched = {}
+    deleted = {staff_id: [] for staff_id in templates}
+    for row in existing:
+        key = (row.staff_id, row.day_of_week, row.start_time, row.end_time)
+        if key[1:] in templates[row.staff_id] and key not in matched:
+            matched[key] = row
+        else:
+            deleted[row.staff_id].append(row.availability_id)
+    to_delete = [i for ids in deleted.values() for i in ids]
+
+    to_insert = []
+    to_update = {True: [], False: []}
+    results = {staff_id: [] for staff_id in templates}
+    result_keys = []
+    for staff_id, template in templates.items():
+        for (day, start, end), is_available in template.items():
+            key = (staff_id, day, start, end)
+            row = matched.get(key)
+            if row is None:
+                status = "created"
+                to_insert.append(
+                    dict(
+                        staff_id=staff_id,
+                        day_of_week=day,
+                        start_time=start,
+                        end_time=end,
+                        is_available=is_available,
+                    )
+                )
+            elif bool(row.is_available) != is_available:
+                status = "updated"
+                to_update[is_available].append(row.availability_id)
+            else:
+                status = "unchanged"
+            result = {
+                "day_of_week": day,
+                "start_time": start.isoformat(),
+                "end_time": end.isoformat(),
+                "is_available": is_available,
+                "result": status,
+            }
+            results[staff_id].append(result)
+            result_keys.append((key, result))
+
+    if to_delete:
+        db.session.execute(
+            StaffAvailability.__table__.delete().where(
+                StaffAvailability.availability_id.in_(to_delete)
+            )
+        )
+    for is_available, ids in to_update.items():
+        if ids:
+            db.session.execute(
+                update(StaffAvailability)
+                .where(StaffAvailability.availability_id.in_(ids))
+                .values(is_available=is_available)
+                .execution_options(synchronize_session=False)
+            )
+    if to_insert:
+        db.session.execute(StaffAvailability.__table__.insert(), to_insert)
+
+    # Ids of the final rows, including the ones just inserted
+    ids = {
+        (row.staff_id, row.day_of_week, row.start_time, row.end_time): (
+            row.availability_id
+        )
+        for row in db.session.query(
+            StaffAvailability.availability_id,
+            StaffAvailability.staff_id,
+            StaffAvailability.day_of_week,
+            StaffAvailability.start_time,
+            StaffAvailability.end_time,
+        ).filter(StaffAvailability.staff_id.in_(staff_ids))
+    }
+    db.session.commit()
+
+    for key, result in result_keys:
+        result["availability_id"] = ids.get(key)
+    counts = Counter(result["result"] for _, result in result_keys)
+
+    return jsonify(
+        staff=[
+            {
+                "staff_id": staff_id,
+                "availability": results[staff_id],
+                "deleted": deleted[staff_id],
+            }
+            for staff_id in templates
+        ],
+        created=counts["created"],
+        updated=counts["updated"],
+        unchanged=counts["unchanged"],
+        deleted=len(to_delete),
+    )
+
+
+def schedule_query(start_date, end_date):
+    """Staff left-joined to their booked/completed appointments in a date range.
+
+    One row per appointment (or one empty row per staff member without
+    any), ordered by (staff_id, scheduled_time) so the caller can group in a
+    single pass. Filter it on Staff.
+    """
+    staff_user = aliased(User)
+    customer = aliased(User)
+    in_range = and_(
+        Appointment.staff_id == Staff.staff_id,
+        Appointment.scheduled_time >= datetime.combine(start_date, time.min),
+        Appointment.scheduled_time
+        < datetime.combine(end_date + timedelta(days=1), time.min),
+        Appointment.status.in_(["booked", "completed"]),
+    )
+    return (
+        db.session.query(
+            Staff.staff_id,
+            staff_user.full_name.label("staff_name"),
+            Appointment.appointment_id,
+            customer.full_name.label("customer_name"),
+            func.coalesce(service_names(), Service.custom_name).label("service_name"),
+            Appointment.scheduled_time,
+            booked_minutes().label("duration"),
+            Appointment.price,
+            Appointment.status,
+            Appointment.notes,
+        )
+        .select_from(Staff)
+        .outerjoin(staff_user, staff_user.user_id == Staff.user_id)
+        .outerjoin(Appointment, in_range)
+        .outerjoin(customer, customer.user_id == Appointment.user_id)
+        .outerjoin(Service, Service.service_id == Appointment.service_id)
+        .order_by(Staff.staff_id, Appointment.scheduled_time)
+    )
+
+
+def group_schedule(query):
+    """Stream a schedule_query, grouped into one calendar column per staff member"""
+    for staff_id, staff_rows in groupby(query, key=lambda row: row.staff_id):
+        appointments = []
+        for row in staff_rows:
+            if row.appointment_id is None:
+                continue
+            appointments.append(
+                {
+                    "appointment_id": row.appointment_id,
+                    "customer_name": row.customer_name or "Unknown",
+                    "service_name": row.service_name or "Unknown",
+                    "scheduled_time": row.scheduled_time.isoformat(),
+                    "duration": int(row.duration or 0),
+                    "price": float(row.price),
+                    "status": row.status,
+                    "notes": row.notes,
+                }
+            )
+        yield {
+            "staff_id": staff_id,
+            "name": row.staff_name or "Unknown",
+            "appointments": appointments,
+        }
+
+
+@api.get("/staff/<int:staff_id>/appointments")
+@require_roles("staff", "owner")
+def staff_schedule(staff_id):
+    """View barber schedule for a day or a range - Criteria: Booking #4"""
+    uid = int(get_jwt_identity())
+    staff = Staff.query.get_or_404(staff_id)
+
+    # Verify authorization
+    if staff.user_id != uid and staff.salon_id not in g.principal.salon_ids:
+        return jsonify(error="Unauthorized"), 403
+
+    start_date, end_date, err = date_range_args()
+    if err:
+        return err
+
+    rows = schedule_query(start_date, end_date).filter(Staff.staff_id == staff_id)
+    columns = list(group_schedule(rows))
+    appointments = columns[0]["appointments"] if columns else []
+
+    return jsonify(
+        date=start_date.isoformat(),
+        start_date=start_date.isoformat(),
+        end_date=end_date.isoformat(),
+        staff_id=staff_id,
+        appointments=appointments,
+        count=len(appointments),
+    )
+
+
+@api.get("/salons/<int:salon_id>/schedule")
+@require_roles("owner", "staff")
+def salon_schedule(salon_id):
+    """Salon calendar: every active staff member's appointments for a day or range"""
+    principal = g.principal
+    if (
+        salon_id not in principal.salon_ids
+        and salon_id not in principal.staff_salon_ids
+    ):
+        return jsonify(error="Not your salon"), 403
+
+    start_date, end_date, err = date_range_args()
+    if err:
+        return err
+
+    rows = schedule_query(start_date, end_date).filter(
+        Staff.salon_id == salon_id, Staff.is_active == True
+    )
+    staff = list(group_schedule(rows))
+
+    return jsonify(
+        salon_id=salon_id,
+        start_date=start_date.isoformat(),
+        end_date=end_date.isoformat(),
+        staff=staff,
+        count=sum(len(column["appointments"]) for column in staff),
+    )
+
+
+# ==================== AVAILABILITY SLOTS ====================
+
+
+def booked_minutes():
+    """Column with an appointment's duration; needs Service joined.
+
+    Multi-service bookings take the summed duration of their service rows.
+    """
+    service_minutes = (
+        db.session.query(func.sum(AppointmentService.duration))
+        .filter(AppointmentService.appointment_id == Appointment.appointment_id)
+        .correlate(Appointment)
+        .scalar_subquery()
+    )
+    return func.coalesce(service_minutes, Service.duration)
+
+
+def booked_intervals(
+    staff_ids, range_start, range_end, exclude_appointment_id=None, lock=False
+):
+    """Busy (start, end) intervals per staff from booked appointments and time off"""
+    busy = {staff_id: [] for staff_id in staff_ids}
+    if not staff_ids:
+        return busy
+
+    query = (
+        db.session.query(
+            Appointment.staff_id,
+            Appointment.scheduled_time,
+            booked_minutes(),
+        )
+        .join(Service, Service.service_id == Appointment.service_id)
+        .filter(
+            Appointment.staff_id.in_(staff_ids),
+            Appointment.status == "booked",
+            Appointment.scheduled_time >= range_start - timedelta(days=1),
+            Appointment.scheduled_time < range_end,
+        )
+    )
+    if exclude_appointment_id:
+        query = query.filter(Appointment.appointment_id != exclude_appointment_id)
+    if lock:
+        # Locking read sees rows committed after this transaction's snapshot
+        query = query.with_for_update(read=True)
+
+    for staff_id, start, minutes in query.all():
+        end = start + timedelta(minutes=int(minutes or 0))
+        if end > range_start:
+            busy[staff_id].append((start, end))
+
+    time_off = StaffTimeOff.query.filter(
+        StaffTimeOff.staff_id.in_(staff_ids),
+        StaffTimeOff.status != "rejected",
+        StaffTimeOff.start_datetime < range_end,
+        StaffTimeOff.end_datetime > range_start,
+    )
+    if lock:
+        time_off = time_off.with_for_update(read=True)
+
+    for t in time_off.all():
+        busy[t.staff_id].append((t.start_datetime, t.end_datetime))
+
+    return {staff_id: merge_intervals(iv) for staff_id, iv in busy.items()}
 
-    try:
-        start = datetime.strptime(data["start_time"], "%H:%M").time()
-        end = datetime.strptime(data["end_time"], "%H:%M").time()
-    except ValueError:
-        return jsonify(error="Time format must be HH:MM"), 400
 
-    availability = StaffAvailability(
-        staff_id=staff_id,
-        day_of_week=data["day_of_week"],
-        start_time=start,
-        end_time=end,
-        is_available=data.get("is_available", True),
-    )
-    db.session.add(availability)
-    db.session.commit()
+def claim_staff_slot(staff_id, salon_id, start, minutes, exclude_appointment_id=None):
+    """Lock a staff member and check that [start, start + minutes) is bookable.
 
-    return (
-        jsonify(
-            availability_id=availability.availability_id, message="Availability added"
-        ),
-        201,
+    The block must lie within the staff member's working hours and overlap
+    no booking or time off. SELECT ... FOR UPDATE on the staff row
+    serializes concurrent bookings for the same staff member until commit;
+    other staff are not blocked. Returns an error response, or None when
+    the slot is claimed.
+    """
+    locked = (
+        db.session.query(Staff.staff_id)
+        .filter_by(staff_id=staff_id, salon_id=salon_id)
+        .with_for_update()
+        .first()
     )
+    if not locked:
+        return jsonify(error="Staff member not found in this salon"), 404
 
+    end = start + timedelta(minutes=minutes)
+    working = working_windows([staff_id], start.date(), end.date())[staff_id]
+    if not any(s <= start and end <= e for s, e in working):
+        return (
+            jsonify(
+                error="Staff member is not working at this time",
+                detail="Bookable hours come from the staff's weekly availability",
+            ),
+            409,
+        )
 
-@app.patch("/staff/availability/<int:availability_id>")
-@require_roles("staff", "owner")
-def update_staff_availability(availability_id):
-    """Block/unblock time slots - Criteria: Booking #5"""
-    uid = int(get_jwt_identity())
-    availability = StaffAvailability.query.get_or_404(availability_id)
-    staff = Staff.query.get(availability.staff_id)
+    busy = booked_intervals(
+        [staff_id], start, end, exclude_appointment_id=exclude_appointment_id, lock=True
+    )[staff_id]
+    if any(s < end and e > start for s, e in busy):
+        return jsonify(error="Time slot is no longer available"), 409
+    return None
 
-    # Verify authorization
-    if staff.user_id != uid:
-        salon = Salon.query.get(staff.salon_id)
-        if not salon or salon.owner_id != uid:
-            return jsonify(error="Unauthorized"), 403
 
-    data = request.get_json()
+def appointment_minutes(appt):
+    """Total booked duration of an appointment in minutes"""
+    minutes = (
+        db.session.query(func.sum(AppointmentService.duration))
+        .filter_by(appointment_id=appt.appointment_id)
+        .scalar()
+    )
+    return int(minutes) if minutes else appt.service.duration
+
+
+def appointment_service_names(appointment_ids):
+    """Service names of each appointment in booking order, joined by ", ".
+
+    Covers multi-service bookings in one query; appointments without
+    service rows are missing from the result.
+    """
+    names = {}
+    if not appointment_ids:
+        return names
+    rows = (
+        db.session.query(AppointmentService.appointment_id, Service.custom_name)
+        .join(Service, Service.service_id == AppointmentService.service_id)
+        .filter(AppointmentService.appointment_id.in_(set(appointment_ids)))
+        .order_by(AppointmentService.appointment_id, AppointmentService.id)
+    )
+    for appointment_id, name in rows:
+        names.setdefault(appointment_id, []).append(name or "Unknown")
+    return {appointment_id: ", ".join(n) for appointment_id, n in names.items()}
+
+
+def service_names():
+    """Column with an appointment's service names in booking order, joined by ", ".
+
+    Correlated to Appointment; NULL for appointments without service rows.
+    """
+    dialect = db.session.get_bind().dialect
+    if dialect.name == "sqlite" and dialect.server_version_info < (3, 44):
+        # No ORDER BY inside aggregates before SQLite 3.44; aggregate rows
+        # that are already in booking order instead
+        rows = (
+            select(AppointmentService.id, Service.custom_name.label("name"))
+            .join(Service, Service.service_id == AppointmentService.service_id)
+            .where(AppointmentService.appointment_id == Appointment.appointment_id)
+            .order_by(AppointmentService.id)
+            .correlate(Appointment)
+            .subquery()
+        )
+        return select(func.group_concat(rows.c.name, ", ")).scalar_subquery()
+    return (
+        select(
+            func.aggregate_strings(Service.custom_name, ", ").aggregate_order_by(
+                AppointmentService.id
+            )
+        )
+        .select_from(AppointmentService)
+        .join(Service, Service.service_id == AppointmentService.service_id)
+        .where(AppointmentService.appointment_id == Appointment.appointment_id)
+        .correlate(Appointment)
+        .scalar_subquery()
+    )
 
-    if "is_available" in data:
-        availability.is_available = data["is_available"]
 
-    if "start_time" in data:
-        try:
-            availability.start_time = datetime.strptime(
-                data["start_time"], "%H:%M"
-            ).time()
-        except ValueError:
-            return jsonify(error="Invalid start_time format"), 400
+def working_windows(staff_ids, start_date, end_date):
+    """Weekly working (start, end) intervals per staff between two dates (inclusive)"""
+    weekly = {staff_id: {} for staff_id in staff_ids}
+    if staff_ids:
+        rows = StaffAvailability.query.filter(
+            StaffAvailability.staff_id.in_(staff_ids),
+            StaffAvailability.is_available == True,
+        ).all()
+        for row in rows:
+            if row.end_time > row.start_time:
+                weekly[row.staff_id].setdefault(row.day_of_week, []).append(
+                    (row.start_time, row.end_time)
+                )
 
-    if "end_time" in data:
-        try:
-            availability.end_time = datetime.strptime(data["end_time"], "%H:%M").time()
-        except ValueError:
-            return jsonify(error="Invalid end_time format"), 400
+    working = {}
+    for staff_id in staff_ids:
+        windows = []
+        day = start_date
+        while day <= end_date:
+            for start, end in weekly[staff_id].get(WEEKDAYS[day.weekday()], []):
+                windows.append(
+                    (datetime.combine(day, start), datetime.combine(day, end))
+                )
+            day += timedelta(days=1)
+        working[staff_id] = merge_intervals(windows)
 
-    db.session.commit()
+    return working
 
-    return jsonify(message="Availability updated")
 
+def free_intervals(staff_ids, start_date, end_date):
+    """Free (start, end) intervals per staff between two dates (inclusive)"""
+    range_start = datetime.combine(start_date, time.min)
+    range_end = datetime.combine(end_date + timedelta(days=1), time.min)
 
-@app.get("/staff/<int:staff_id>/appointments")
-@require_roles("staff", "owner")
-def staff_schedule(staff_id):
-    """View barber daily schedule - Criteria: Booking #4"""
-    uid = int(get_jwt_identity())
-    staff = Staff.query.get_or_404(staff_id)
+    working = working_windows(staff_ids, start_date, end_date)
+    busy = booked_intervals(staff_ids, range_start, range_end)
+    return {
+        staff_id: subtract_intervals(working[staff_id], busy[staff_id])
+        for staff_id in staff_ids
+    }
 
-    # Verify authorization
-    if staff.user_id != uid:
-        salon = Salon.query.get(staff.salon_id)
-        if not salon or salon.owner_id != uid:
-            return jsonify(error="Unauthorized"), 403
 
-    # Get date filter
-    date_str = request.args.get("date")
-    if date_str:
-        try:
-            filter_date = datetime.strptime(date_str, "%Y-%m-%d").date()
-        except ValueError:
-            return jsonify(error="Date format must be YYYY-MM-DD"), 400
-    else:
-        filter_date = date.today()
+def slot_starts(intervals, duration, step):
+    """Start times on a step grid where a block of duration minutes fits"""
+    length = timedelta(minutes=duration)
+    step_delta = timedelta(minutes=step)
+    slots = []
+    for start, end in intervals:
+        minutes = start.hour * 60 + start.minute + (1 if start.second else 0)
+        offset = -minutes % step
+        t = start.replace(second=0, microsecond=0) + timedelta(minutes=offset)
+        while t + length <= end:
+            slots.append(t)
+            t += step_delta
+    return slots
+
+
+@api.get("/salons/<int:salon_id>/slots")
+def available_slots(salon_id):
+    """Bookable time slots per staff member for a service or a service combo"""
+    try:
+        service_ids = [
+            int(i) for i in request.args.get("service_ids", "").split(",") if i
+        ] or [request.args.get("service_id", type=int)]
+    except ValueError:
+        return jsonify(error="service_ids must be comma-separated integers"), 400
+    if not service_ids[0]:
+        return jsonify(error="service_id required"), 400
+    if len(set(service_ids)) != len(service_ids):
+        return jsonify(error="service_ids must not repeat a service"), 400
+
+    services = Service.query.filter(
+        Service.service_id.in_(service_ids),
+        Service.salon_id == salon_id,
+        Service.is_active == True,
+    ).all()
+    if len(services) != len(service_ids):
+        return jsonify(error="Service not found"), 404
+    duration = sum(service.duration for service in services)
 
-    # Query appointments
-    start_of_day = datetime.combine(filter_date, time.min)
-    end_of_day = datetime.combine(filter_date, time.max)
+    start_date, end_date, err = date_range_args()
+    if err:
+        return err
 
-    appointments = (
-        Appointment.query.filter(
-            and_(
-                Appointment.staff_id == staff_id,
-                Appointment.scheduled_time >= start_of_day,
-                Appointment.scheduled_time <= end_of_day,
-                Appointment.status.in_(["booked", "completed"]),
+    step = request.args.get("step", SLOT_STEP_MINUTES, type=int)
+    if step <= 0:
+        return jsonify(error="step must be positive"), 400
+
+    # Staff explicitly linked to each service, otherwise every active staff member
+    staff_query = Staff.query.options(joinedload(Staff.user)).filter_by(
+        salon_id=salon_id, is_active=True
+    )
+    linked = (
+        db.session.query(StaffService.service_id)
+        .filter(StaffService.service_id.in_(service_ids))
+        .distinct()
+    )
+    for (service_id,) in linked:
+        staff_query = staff_query.filter(
+            Staff.staff_id.in_(
+                select(StaffService.staff_id).where(
+                    StaffService.service_id == service_id
+                )
             )
         )
-        .order_by(Appointment.scheduled_time)
-        .all()
-    )
+    staff_list = staff_query.order_by(Staff.staff_id).all()
 
-    result = []
-    for appt in appointments:
-        user = User.query.get(appt.user_id)
-        service = Service.query.get(appt.service_id)
-        result.append(
-            {
-                "appointment_id": appt.appointment_id,
-                "customer_name": user.full_name if user else "Unknown",
-                "service_name": service.custom_name if service else "Unknown",
-                "scheduled_time": appt.scheduled_time.isoformat(),
-                "duration": service.duration if service else 0,
-                "price": float(appt.price),
-                "status": appt.status,
-                "notes": appt.notes,
-            }
-        )
+    free = free_intervals([st.staff_id for st in staff_list], start_date, end_date)
 
     return jsonify(
-        date=filter_date.isoformat(),
-        staff_id=staff_id,
-        appointments=result,
-        count=len(result),
+        salon_id=salon_id,
+        service_id=service_ids[0],
+        service_ids=service_ids,
+        duration=duration,
+        step=step,
+        start_date=start_date.isoformat(),
+        end_date=end_date.isoformat(),
+        staff=[
+            {
+                "staff_id": st.staff_id,
+                "name": st.user.full_name if st.user else "Unknown",
+                "slots": [
+                    t.isoformat()
+                    for t in slot_starts(free[st.staff_id], duration, step)
+                ],
+            }
+            for st in staff_list
+        ],
     )
 
 
 # ==================== SERVICES ====================
 
 
-@app.get("/salons/<int:salon_id>/services")
+@api.get("/salons/<int:salon_id>/services")
+@catalog_cached
 def list_services(salon_id):
     """List salon services"""
-    services = Service.query.filter_by(salon_id=salon_id, is_active=True).all()
+    query = Service.query.options(joinedload(Service.category)).filter_by(
+        salon_id=salon_id, is_active=True
+    )
+
+    services, next_cursor, err = keyset_page(query, [Service.service_id])
+    if err:
+        return err
 
     result = []
     for sv in services:
-        category = ServiceCategory.query.get(sv.category_id)
+        category = sv.category
         result.append(
             {
                 "service_id": sv.service_id,
@@ -992,10 +3113,10 @@ def list_services(salon_id):
             }
         )
 
-    return jsonify(services=result, count=len(result))
+    return jsonify(services=result, count=len(result), next_cursor=next_cursor)
 
 
-@app.post("/salons/<int:salon_id>/services")
+@api.post("/salons/<int:salon_id>/services")
 @require_roles("owner")
 def create_service(salon_id):
     """Create new service"""
@@ -1023,17 +3144,141 @@ def create_service(salon_id):
     )
     db.session.add(service)
     db.session.commit()
+    invalidate_catalog(salon_id)
 
     return jsonify(service_id=service.service_id, message="Service created"), 201
 
 
+def service_text_match(q):
+    """Condition on Service matching q in its name, description or category.
+
+    MySQL uses the ngram FULLTEXT indexes (q is searched as one phrase);
+    other databases fall back to substring LIKE. Name/description and
+    category matches are unioned so each side can use its own index.
+    """
+    if db.session.get_bind().dialect.name == "mysql":
+        # Boolean-mode operators in user input would change the query
+        phrase = '"%s"' % "".join(
+            " " if ch in '+-<>()~*"@' else ch for ch in q
+        ).strip()
+        by_service = mysql.match(
+            Service.custom_name, Service.description, against=phrase
+        ).in_boolean_mode()
+        by_category = mysql.match(
+            ServiceCategory.name, against=phrase
+        ).in_boolean_mode()
+    else:
+        by_service = or_(
+            Service.custom_name.contains(q, autoescape=True),
+            Service.description.contains(q, autoescape=True),
+        )
+        by_category = ServiceCategory.name.contains(q, autoescape=True)
+
+    return Service.service_id.in_(
+        union(
+            select(Service.service_id).where(by_service),
+            select(Service.service_id)
+            .join(ServiceCategory, ServiceCategory.category_id == Service.category_id)
+            .where(by_category),
+        )
+    )
+
+
+@api.get("/services/search")
+def search_services():
+    """Search active services across salons by text, category, price and duration"""
+    q = request.args.get("q", "").strip()
+    if q and len(q) < 2:
+        return jsonify(error="q must be at least 2 characters"), 400
+    try:
+        max_price = request.args.get("max_price")
+        max_price = Decimal(max_price) if max_price else None
+        max_duration = request.args.get("max_duration")
+        max_duration = int(max_duration) if max_duration else None
+    except (ArithmeticError, ValueError):
+        return jsonify(error="max_price and max_duration must be numbers"), 400
+    sort = request.args.get("sort", "price")
+    if sort not in ("price", "rating"):
+        return jsonify(error="sort must be 'price' or 'rating'"), 400
+
+    salon_rating = func.coalesce(SalonRating.average_rating, 0)
+    query = (
+        db.session.query(
+            Service.service_id,
+            Service.custom_name,
+            ServiceCategory.name.label("category"),
+            Service.duration,
+            Service.price,
+            Service.description,
+            Salon.salon_id,
+            Salon.name.label("salon_name"),
+            salon_rating.label("salon_rating"),
+            func.coalesce(SalonRating.review_count, 0).label("review_count"),
+        )
+        .join(Salon, Salon.salon_id == Service.salon_id)
+        .outerjoin(ServiceCategory, ServiceCategory.category_id == Service.category_id)
+        .outerjoin(SalonRating, SalonRating.salon_id == Service.salon_id)
+        .filter(Service.is_active == True)
+    )
+    salon_status = request.args.get("salon_status", "active")
+    if salon_status:
+        query = query.filter(Salon.status == salon_status)
+    if q:
+        query = query.filter(service_text_match(q))
+    if request.args.get("category"):
+        query = query.filter(ServiceCategory.name == request.args["category"])
+    if max_price is not None:
+        query = query.filter(Service.price <= max_price)
+    if max_duration is not None:
+        query = query.filter(Service.duration <= max_duration)
+
+    if sort == "rating":
+        services, next_cursor, err = keyset_page(
+            query,
+            [salon_rating, Service.service_id],
+            descending=True,
+            key=lambda row: [row.salon_rating, row.service_id],
+        )
+    else:
+        services, next_cursor, err = keyset_page(
+            query, [Service.price, Service.service_id]
+        )
+    if err:
+        return err
+
+    result = [
+        {
+            "service_id": row.service_id,
+            "name": row.custom_name,
+            "category": row.category,
+            "duration": row.duration,
+            "price": float(row.price),
+            "description": row.description,
+            "salon": {
+                "salon_id": row.salon_id,
+                "name": row.salon_name,
+                "average_rating": float(row.salon_rating),
+                "review_count": row.review_count,
+            },
+        }
+        for row in services
+    ]
+
+    return jsonify(services=result, count=len(result), next_cursor=next_cursor)
+
+
 # ==================== PRODUCTS (SHOP) ====================
 
 
-@app.get("/salons/<int:salon_id>/products")
+@api.get("/salons/<int:salon_id>/products")
+@catalog_cached
 def list_products(salon_id):
     """List salon products - Criteria: Shopping #1"""
-    products = Product.query.filter_by(salon_id=salon_id, is_active=True).all()
+    query = Product.query.filter_by(salon_id=salon_id, is_active=True)
+
+    products, next_cursor, err = keyset_page(query, [Product.product_id])
+    if err:
+        return err
 
     return jsonify(
         products=[
@@ -1049,10 +3294,11 @@ def list_products(salon_id):
             for p in products
         ],
         count=len(products),
+        next_cursor=next_cursor,
     )
 
 
-@app.post("/salons/<int:salon_id>/products")
+@api.post("/salons/<int:salon_id>/products")
 @require_roles("owner")
 def create_product(salon_id):
     """Create product for salon shop"""
@@ -1081,13 +3327,14 @@ def create_product(salon_id):
     )
     db.session.add(product)
     db.session.commit()
+    invalidate_catalog(salon_id)
 
     return jsonify(product_id=product.product_id, message="Product created"), 201
 
 
 # ==================== APPOINTMENTS ====================
 
-# @app.post("/appointments")
+# @api.post("/appointments")
 # @jwt_required()
 # def book_appointment():
 #     """Book appointment"""
@@ -1155,10 +3402,11 @@ def create_product(salon_id):
 #     )
 
 
-@app.post("/appointments")
+@api.post("/appointments")
 @jwt_required()
+@idempotent
 def book_appointment():
-    """Book appointment"""
+    """Book appointment for one service or an ordered list of service_ids"""
     err = json_required()
     if err:
         return err
@@ -1166,10 +3414,23 @@ def book_appointment():
     uid = int(get_jwt_identity())
     data = request.get_json()
 
-    required = ("salon_id", "service_id", "scheduled_time")
-    if any(k not in data for k in required):
+    service_ids = data.get("service_ids")
+    if service_ids is None and "service_id" in data:
+        service_ids = [data["service_id"]]
+
+    required = ("salon_id", "scheduled_time")
+    if any(k not in data for k in required) or service_ids is None:
         return jsonify(error="Missing required fields"), 400
 
+    if (
+        not isinstance(service_ids, list)
+        or not service_ids
+        or not all(isinstance(i, int) for i in service_ids)
+    ):
+        return jsonify(error="service_ids must be a list of integers"), 400
+    if len(set(service_ids)) != len(service_ids):
+        return jsonify(error="service_ids must not repeat a service"), 400
+
     try:
         sched_at = datetime.fromisoformat(data["scheduled_time"])
     except Exception:
@@ -1180,102 +3441,178 @@ def book_appointment():
             400,
         )
 
-    service = Service.query.get_or_404(data["service_id"])
+    found = {
+        service.service_id: service
+        for service in Service.query.filter(
+            Service.service_id.in_(service_ids),
+            Service.salon_id == data["salon_id"],
+            Service.is_active == True,
+        )
+    }
+    missing = [i for i in service_ids if i not in found]
+    if missing:
+        return jsonify(error="Service not found", service_ids=missing), 404
+    services = [found[i] for i in service_ids]
+
+    # The services run back to back as one block on the staff calendar
+    total_minutes = sum(service.duration for service in services)
+    total_price = sum(service.price for service in services)
+
+    staff_id = data.get("staff_id")
+    if staff_id is not None and not isinstance(staff_id, int):
+        return jsonify(error="staff_id must be an integer"), 400
+    if staff_id:
+        # Services with linked staff may only be booked with one of them
+        linked = {}
+        for service_id, linked_staff_id in db.session.query(
+            StaffService.service_id, StaffService.staff_id
+        ).filter(StaffService.service_id.in_(service_ids)):
+            linked.setdefault(service_id, set()).add(linked_staff_id)
+        if any(staff_id not in staff_ids for staff_ids in linked.values()):
+            return (
+                jsonify(error="Staff member does not offer every requested service"),
+                400,
+            )
+
+        err = claim_staff_slot(staff_id, data["salon_id"], sched_at, total_minutes)
+        if err:
+            db.session.rollback()
+            return err
 
     appt = Appointment(
         user_id=uid,
         salon_id=data["salon_id"],
-        staff_id=data.get("staff_id"),
-        service_id=service.service_id,
+        staff_id=staff_id,
+        service_id=services[0].service_id,
         scheduled_time=sched_at,
-        price=service.price,
+        price=total_price,
         status="booked",
         notes=data.get("notes"),
     )
     db.session.add(appt)
     db.session.flush()
 
-    db.session.add(
-        AppointmentService(
-            appointment_id=appt.appointment_id,
-            service_id=service.service_id,
-            duration=service.duration,
-            price=service.price,
-        )
+    db.session.execute(
+        AppointmentService.__table__.insert(),
+        [
+            {
+                "appointment_id": appt.appointment_id,
+                "service_id": service.service_id,
+                "duration": service.duration,
+                "price": service.price,
+            }
+            for service in services
+        ],
     )
     db.session.commit()
 
+    starts = sched_at
+    booked = []
+    for service in services:
+        booked.append(
+            {
+                "service_id": service.service_id,
+                "service_name": service.custom_name,
+                "start_time": starts.isoformat(),
+                "duration": service.duration,
+                "price": float(service.price),
+            }
+        )
+        starts += timedelta(minutes=service.duration)
+
     return (
         jsonify(
             appointment_id=appt.appointment_id,
             status=appt.status,
             scheduled_time=appt.scheduled_time.isoformat(),
+            duration=total_minutes,
             price=float(appt.price),
+            services=booked,
         ),
         201,
     )
 
 
-@app.get("/appointments")
+@api.get("/appointments")
 @jwt_required()
 def list_appointments():
     """Get user appointments"""
     uid = int(get_jwt_identity())
-    user = User.query.get(uid)
+    principal = current_principal()
+    if not principal:
+        return jsonify(error="User not found"), 404
+
+    query = Appointment.query.options(
+        joinedload(Appointment.salon), joinedload(Appointment.service)
+    )
 
-    if user.user_role == "staff":
+    if principal.role == "staff":
         # Get staff appointments
-        staff = Staff.query.filter_by(user_id=uid).first()
-        if staff:
-            appointments = Appointment.query.filter_by(staff_id=staff.staff_id).all()
+        if principal.staff_id:
+            query = query.filter_by(staff_id=principal.staff_id)
         else:
-            appointments = []
+            query = query.filter(false())
     else:
         # Get user's own appointments
-        appointments = Appointment.query.filter_by(user_id=uid).all()
+        query = query.filter_by(user_id=uid)
+
+    appointments, next_cursor, err = keyset_page(query, [Appointment.appointment_id])
+    if err:
+        return err
+    names = appointment_service_names([a.appointment_id for a in appointments])
 
     result = []
     for appt in appointments:
-        salon = Salon.query.get(appt.salon_id)
-        service = Service.query.get(appt.service_id)
+        salon = appt.salon
+        service = appt.service
         result.append(
             {
                 "appointment_id": appt.appointment_id,
                 "salon_name": salon.name if salon else "Unknown",
-                "service_name": service.custom_name if service else "Unknown",
+                "service_name": names.get(appt.appointment_id)
+                or (service.custom_name if service else "Unknown"),
                 "scheduled_time": appt.scheduled_time.isoformat(),
                 "status": appt.status,
                 "price": float(appt.price),
             }
         )
 
-    return jsonify(appointments=result, count=len(result))
+    return jsonify(appointments=result, count=len(result), next_cursor=next_cursor)
 
 
-@app.get("/users/me/appointments")
+@api.get("/users/me/appointments")
 @jwt_required()
 def my_appointments():
     """View visit history - Criteria: Profile #1"""
     uid = int(get_jwt_identity())
 
-    appointments = (
-        Appointment.query.filter_by(user_id=uid)
-        .order_by(Appointment.scheduled_time.desc())
-        .all()
+    query = Appointment.query.options(
+        joinedload(Appointment.salon),
+        joinedload(Appointment.service),
+        joinedload(Appointment.staff).joinedload(Staff.user),
+    ).filter_by(user_id=uid)
+
+    appointments, next_cursor, err = keyset_page(
+        query,
+        [Appointment.scheduled_time, Appointment.appointment_id],
+        descending=True,
     )
+    if err:
+        return err
+    names = appointment_service_names([a.appointment_id for a in appointments])
 
     result = []
     for appt in appointments:
-        salon = Salon.query.get(appt.salon_id)
-        service = Service.query.get(appt.service_id)
-        staff = Staff.query.get(appt.staff_id) if appt.staff_id else None
-        staff_user = User.query.get(staff.user_id) if staff else None
+        salon = appt.salon
+        service = appt.service
+        staff_user = appt.staff.user if appt.staff else None
 
         result.append(
             {
                 "appointment_id": appt.appointment_id,
                 "salon_name": salon.name if salon else "Unknown",
-                "service_name": service.custom_name if service else "Unknown",
+                "service_name": names.get(appt.appointment_id)
+                or (service.custom_name if service else "Unknown"),
                 "staff_name": staff_user.full_name if staff_user else None,
                 "scheduled_time": appt.scheduled_time.isoformat(),
                 "status": appt.status,
@@ -1284,10 +3621,10 @@ def my_appointments():
             }
         )
 
-    return jsonify(appointments=result, count=len(result))
+    return jsonify(appointments=result, count=len(result), next_cursor=next_cursor)
 
 
-@app.get("/salons/<int:salon_id>/customers/<int:customer_id>/history")
+@api.get("/salons/<int:salon_id>/customers/<int:customer_id>/history")
 @require_roles("owner", "staff")
 def customer_history(salon_id, customer_id):
     """View customer visit history - Criteria: Profile #2"""
@@ -1295,29 +3632,35 @@ def customer_history(salon_id, customer_id):
     salon = Salon.query.get_or_404(salon_id)
 
     # Verify authorization
-    user = User.query.get(uid)
-    if user.user_role == "owner" and salon.owner_id != uid:
+    principal = g.principal
+    if principal.role == "owner" and salon.owner_id != uid:
         return jsonify(error="Not your salon"), 403
-    elif user.user_role == "staff":
-        staff = Staff.query.filter_by(user_id=uid, salon_id=salon_id).first()
-        if not staff:
+    elif principal.role == "staff":
+        if salon_id not in principal.staff_salon_ids:
             return jsonify(error="Not staff at this salon"), 403
 
-    appointments = (
-        Appointment.query.filter_by(salon_id=salon_id, user_id=customer_id)
-        .order_by(Appointment.scheduled_time.desc())
-        .all()
+    query = Appointment.query.filter_by(salon_id=salon_id, user_id=customer_id)
+    total_visits = query.count()
+
+    appointments, next_cursor, err = keyset_page(
+        query.options(joinedload(Appointment.service)),
+        [Appointment.scheduled_time, Appointment.appointment_id],
+        descending=True,
     )
+    if err:
+        return err
 
     customer = User.query.get(customer_id)
+    names = appointment_service_names([a.appointment_id for a in appointments])
 
     result = []
     for appt in appointments:
-        service = Service.query.get(appt.service_id)
+        service = appt.service
         result.append(
             {
                 "appointment_id": appt.appointment_id,
-                "service_name": service.custom_name if service else "Unknown",
+                "service_name": names.get(appt.appointment_id)
+                or (service.custom_name if service else "Unknown"),
                 "scheduled_time": appt.scheduled_time.isoformat(),
                 "status": appt.status,
                 "price": float(appt.price),
@@ -1332,11 +3675,12 @@ def customer_history(salon_id, customer_id):
             "phone": customer.phone,
         },
         appointments=result,
-        total_visits=len(result),
+        total_visits=total_visits,
+        next_cursor=next_cursor,
     )
 
 
-@app.patch("/appointments/<int:appointment_id>/reschedule")
+@api.patch("/appointments/<int:appointment_id>/reschedule")
 @jwt_required()
 def reschedule_appointment(appointment_id):
     """Reschedule appointment - Criteria: Booking #2"""
@@ -1356,10 +3700,30 @@ def reschedule_appointment(appointment_id):
 
     new_time = request.get_json().get("scheduled_time")
     try:
-        appt.scheduled_time = datetime.fromisoformat(new_time)
+        new_time = datetime.fromisoformat(new_time)
     except Exception:
         return jsonify(error="scheduled_time must be ISO 8601"), 400
 
+    if appt.staff_id:
+        err = claim_staff_slot(
+            appt.staff_id,
+            appt.salon_id,
+            new_time,
+            appointment_minutes(appt),
+            exclude_appointment_id=appt.appointment_id,
+        )
+        if err:
+            db.session.rollback()
+            return err
+
+    db.session.add(
+        AppointmentReschedule(
+            appointment_id=appt.appointment_id,
+            previous_scheduled_time=appt.scheduled_time,
+            scheduled_time=new_time,
+        )
+    )
+    appt.scheduled_time = new_time
     db.session.commit()
 
     # Send notification
@@ -1374,7 +3738,7 @@ def reschedule_appointment(appointment_id):
     )
 
 
-@app.patch("/appointments/<int:appointment_id>/cancel")
+@api.patch("/appointments/<int:appointment_id>/cancel")
 @jwt_required()
 def cancel_appointment(appointment_id):
     """Cancel appointment - Criteria: Booking #3"""
@@ -1401,45 +3765,54 @@ def cancel_appointment(appointment_id):
     return jsonify(message="Appointment cancelled")
 
 
-@app.patch("/appointments/<int:appointment_id>/complete")
+@api.patch("/appointments/<int:appointment_id>/complete")
 @require_roles("staff", "owner")
 def complete_appointment(appointment_id):
     """Mark appointment as completed and award loyalty points"""
-    uid = int(get_jwt_identity())
     appt = Appointment.query.get_or_404(appointment_id)
 
     # Verify authorization
-    user = User.query.get(uid)
-    if user.user_role == "staff":
-        staff = Staff.query.filter_by(user_id=uid).first()
-        if not staff or staff.staff_id != appt.staff_id:
+    principal = g.principal
+    if principal.role == "staff":
+        if not principal.staff_id or principal.staff_id != appt.staff_id:
             return jsonify(error="Not your appointment"), 403
-    elif user.user_role == "owner":
-        salon = Salon.query.get(appt.salon_id)
-        if salon.owner_id != uid:
+    elif principal.role == "owner":
+        if appt.salon_id not in principal.salon_ids:
             return jsonify(error="Not your salon"), 403
 
     if appt.status == "completed":
         return jsonify(message="Already completed"), 200
 
-    appt.status = "completed"
+    # Conditional UPDATE so concurrent completions award points only once
+    completed = db.session.execute(
+        update(Appointment)
+        .where(
+            Appointment.appointment_id == appt.appointment_id,
+            Appointment.status != "completed",
+        )
+        .values(status="completed")
+    ).rowcount
+    if not completed:
+        return jsonify(message="Already completed"), 200
 
     # Award loyalty points - Criteria: Loyalty #3
-    points_earned = award_loyalty_points(appt.user_id, appt.salon_id, appt.price)
-
-    db.session.commit()
+    points_earned = award_loyalty_points(
+        appt.user_id, appt.salon_id, appt.price, "appointment", appt.appointment_id
+    )
 
     # Send notification
-    send_notification(
+    enqueue_notification(
         user_id=appt.user_id,
         notification_type="status_update",
         message=f"Your appointment is complete! You earned {points_earned} loyalty points.",
     )
 
+    db.session.commit()
+
     return jsonify(message="Appointment completed", points_earned=points_earned)
 
 
-# @app.post("/appointments/<int:appointment_id>/images")
+# @api.post("/appointments/<int:appointment_id>/images")
 # @jwt_required()
 # def upload_appointment_images(appointment_id):
 #     """Upload before/after images - Criteria: Profile #5"""
@@ -1497,7 +3870,7 @@ def complete_appointment(appointment_id):
 # ==================== CART & CHECKOUT ====================
 
 
-@app.post("/carts")
+@api.post("/carts")
 @jwt_required()
 def create_cart():
     """Create shopping cart"""
@@ -1526,7 +3899,7 @@ def create_cart():
     return jsonify(cart_id=cart.cart_id), 201
 
 
-@app.get("/carts/active")
+@api.get("/carts/active")
 @jwt_required()
 def get_active_cart():
     """Get user's active cart"""
@@ -1536,14 +3909,20 @@ def get_active_cart():
     if not cart:
         return jsonify(message="No active cart", cart=None), 200
 
-    items = CartItem.query.filter_by(cart_id=cart.cart_id).all()
+    items = (
+        CartItem.query.options(
+            joinedload(CartItem.product), joinedload(CartItem.service)
+        )
+        .filter_by(cart_id=cart.cart_id)
+        .all()
+    )
 
     cart_items = []
     total = 0
 
     for item in items:
         if item.type == "product":
-            product = Product.query.get(item.product_id)
+            product = item.product
             cart_items.append(
                 {
                     "item_id": item.item_id,
@@ -1555,7 +3934,7 @@ def get_active_cart():
                 }
             )
         else:
-            service = Service.query.get(item.service_id)
+            service = item.service
             cart_items.append(
                 {
                     "item_id": item.item_id,
@@ -1578,7 +3957,7 @@ def get_active_cart():
     )
 
 
-@app.post("/carts/<int:cart_id>/items")
+@api.post("/carts/<int:cart_id>/items")
 @jwt_required()
 def add_cart_item(cart_id):
     """Add item to cart - Criteria: Shopping #2"""
@@ -1621,7 +4000,7 @@ def add_cart_item(cart_id):
     return jsonify(item_id=item.item_id, message="Item added to cart"), 201
 
 
-@app.delete("/carts/items/<int:item_id>")
+@api.delete("/carts/items/<int:item_id>")
 @jwt_required()
 def remove_cart_item(item_id):
     """Remove item from cart"""
@@ -1638,8 +4017,9 @@ def remove_cart_item(item_id):
     return jsonify(message="Item removed")
 
 
-@app.post("/checkout")
+@api.post("/checkout")
 @jwt_required()
+@idempotent
 def checkout():
     """Checkout cart - Criteria: Shopping #2, Payments #1, #2"""
     err = json_required()
@@ -1650,7 +4030,8 @@ def checkout():
     data = request.get_json()
 
     cart_id = data.get("cart_id")
-    cart = Cart.query.get_or_404(cart_id)
+    # Row lock serializes concurrent checkouts of the same cart
+    cart = Cart.query.filter_by(cart_id=cart_id).with_for_update().first_or_404()
 
     if cart.user_id != uid or cart.status != "active":
         return jsonify(error="Invalid cart"), 400
@@ -1665,21 +4046,36 @@ def checkout():
     # Apply loyalty points redemption - Criteria: Loyalty #5
     points_to_redeem = int(data.get("redeem_points", 0))
     discount = 0
+    redemption = None
 
     if points_to_redeem > 0:
-        loyalty = Loyalty.query.filter_by(user_id=uid, salon_id=cart.salon_id).first()
-        if not loyalty or loyalty.points < points_to_redeem:
+        redemption = redeem_loyalty_points(uid, cart.salon_id, points_to_redeem)
+        if not redemption:
             return jsonify(error="Insufficient loyalty points"), 400
 
-        # Get redemption rate
-        settings = SalonSettings.query.filter_by(salon_id=cart.salon_id).first()
-        redemption_rate = float(settings.loyalty_redemption_rate) if settings else 0.01
-
+        redemption_rate = salon_loyalty_settings(cart.salon_id).redemption_rate
         discount = points_to_redeem * redemption_rate
-        loyalty.points -= points_to_redeem
 
     total = subtotal - discount
 
+    # Reserve stock for every product line in one statement
+    quantities = {}
+    for i in items:
+        if i.type == "product" and i.product_id:
+            quantities[i.product_id] = quantities.get(i.product_id, 0) + i.quantity
+
+    if not reserve_stock(quantities):
+        db.session.rollback()
+        stock = dict(
+            db.session.query(Product.product_id, Product.stock).filter(
+                Product.product_id.in_(list(quantities))
+            )
+        )
+        short = [
+            pid for pid, qty in quantities.items() if (stock.get(pid) or 0) < qty
+        ]
+        return jsonify(error="Insufficient stock", product_ids=short), 409
+
     # Create payment
     pay = Payment(
         user_id=uid,
@@ -1716,19 +4112,19 @@ def checkout():
             )
         )
 
-        # Update product stock
-        if i.type == "product" and i.product_id:
-            product = Product.query.get(i.product_id)
-            if product:
-                product.stock -= i.quantity
-
     # Mark cart as checked out
     cart.status = "checked_out"
 
+    if redemption:
+        redemption.reference_id = order.order_id
+
     # Award loyalty points for purchase - Criteria: Loyalty #3
-    points_earned = award_loyalty_points(uid, cart.salon_id, total)
+    points_earned = award_loyalty_points(
+        uid, cart.salon_id, total, "purchase", order.order_id
+    )
 
     db.session.commit()
+    invalidate_catalog(cart.salon_id)
 
     # Send notification
     # send_notification(
@@ -1751,16 +4147,18 @@ def checkout():
 # ==================== LOYALTY PROGRAM ====================
 
 
-@app.get("/loyalty")
+@api.get("/loyalty")
 @jwt_required()
 def loyalty_balance():
     """View loyalty points balance - Criteria: Loyalty #4"""
     uid = int(get_jwt_identity())
-    records = Loyalty.query.filter_by(user_id=uid).all()
+    records = (
+        Loyalty.query.options(joinedload(Loyalty.salon)).filter_by(user_id=uid).all()
+    )
 
     result = []
     for r in records:
-        salon = Salon.query.get(r.salon_id)
+        salon = r.salon
         result.append(
             {
                 "salon_id": r.salon_id,
@@ -1774,7 +4172,7 @@ def loyalty_balance():
     return jsonify(loyalty=result, total_salons=len(result))
 
 
-@app.get("/loyalty/<int:salon_id>")
+@api.get("/loyalty/<int:salon_id>")
 @jwt_required()
 def loyalty_by_salon(salon_id):
     """Get loyalty points for specific salon"""
@@ -1809,7 +4207,7 @@ def loyalty_by_salon(salon_id):
 # ==================== REVIEWS ====================
 
 
-@app.post("/reviews")
+@api.post("/reviews")
 @jwt_required()
 def create_review():
     """Leave review - Criteria: Profile #3"""
@@ -1850,23 +4248,31 @@ def create_review():
         comment=data.get("comment"),
     )
     db.session.add(rv)
+
+    record_rating(SalonRating, SalonRating.salon_id, appt.salon_id, rating)
+    if appt.staff_id:
+        record_rating(StaffRating, StaffRating.staff_id, appt.staff_id, rating)
+
     db.session.commit()
+    invalidate_catalog(appt.salon_id)
 
     return jsonify(review_id=rv.review_id, message="Review submitted successfully"), 201
 
 
-@app.get("/salons/<int:salon_id>/reviews")
+@api.get("/salons/<int:salon_id>/reviews")
 def list_reviews(salon_id):
     """Get salon reviews"""
-    reviews = (
-        Review.query.filter_by(salon_id=salon_id)
-        .order_by(Review.created_at.desc())
-        .all()
+    query = Review.query.options(joinedload(Review.user)).filter_by(salon_id=salon_id)
+
+    reviews, next_cursor, err = keyset_page(
+        query, [Review.created_at, Review.review_id], descending=True
     )
+    if err:
+        return err
 
     result = []
     for rv in reviews:
-        user = User.query.get(rv.user_id)
+        user = rv.user
         result.append(
             {
                 "review_id": rv.review_id,
@@ -1881,30 +4287,27 @@ def list_reviews(salon_id):
             }
         )
 
-    # Calculate average rating
-    avg_rating = (
-        db.session.query(func.avg(Review.rating)).filter_by(salon_id=salon_id).scalar()
-    )
+    summary = rating_summary(SalonRating.query.get(salon_id))
 
     return jsonify(
         reviews=result,
         count=len(result),
-        average_rating=float(avg_rating) if avg_rating else 0,
+        average_rating=summary["average_rating"],
+        rating=summary,
+        next_cursor=next_cursor,
     )
 
 
-@app.patch("/reviews/<int:review_id>/respond")
+@api.patch("/reviews/<int:review_id>/respond")
 @require_roles("owner", "admin")
 def respond_review(review_id):
     """Respond to review - Criteria: Profile #4"""
-    uid = int(get_jwt_identity())
     review = Review.query.get_or_404(review_id)
 
     # Verify ownership
-    user = User.query.get(uid)
-    if user.user_role == "owner":
-        salon = Salon.query.get(review.salon_id)
-        if salon.owner_id != uid:
+    principal = g.principal
+    if principal.role == "owner":
+        if review.salon_id not in principal.salon_ids:
             return jsonify(error="Not your salon"), 403
 
     data = request.get_json()
@@ -1914,51 +4317,62 @@ def respond_review(review_id):
 
     review.response = data["response"]
     review.responded_at = datetime.utcnow()
-    db.session.commit()
 
     # Notify customer
-    send_notification(
+    enqueue_notification(
         user_id=review.user_id,
         notification_type="status_update",
         message=f"The salon has responded to your review!",
     )
 
+    db.session.commit()
+
     return jsonify(message="Response added successfully")
 
 
 # ==================== NOTIFICATIONS ====================
 
 
-@app.get("/notifications")
+def notification_json(n):
+    """API representation of a notification"""
+    return {
+        "notification_id": n.notification_id,
+        "type": n.type,
+        "message": n.message,
+        "is_read": n.is_read,
+        "sent_at": n.sent_at.isoformat() if n.sent_at else None,
+    }
+
+
+@api.get("/notifications")
 @jwt_required()
 def get_notifications():
     """Get user notifications"""
     uid = int(get_jwt_identity())
 
-    notifications = (
-        Notification.query.filter_by(user_id=uid)
-        .order_by(Notification.sent_at.desc())
-        .limit(50)
-        .all()
+    notifications, next_cursor, err = keyset_page(
+        Notification.query.filter_by(user_id=uid),
+        [Notification.sent_at, Notification.notification_id],
+        descending=True,
     )
+    if err:
+        return err
 
     return jsonify(
-        notifications=[
-            {
-                "notification_id": n.notification_id,
-                "type": n.type,
-                "title": n.title,
-                "message": n.message,
-                "is_read": n.is_read,
-                "sent_at": n.sent_at.isoformat() if n.sent_at else None,
-            }
-            for n in notifications
-        ],
-        unread_count=sum(1 for n in notifications if not n.is_read),
+        notifications=[notification_json(n) for n in notifications],
+        unread_count=unread_count(uid),
+        next_cursor=next_cursor,
     )
 
 
-@app.patch("/notifications/<int:notification_id>/read")
+@api.get("/notifications/unread-count")
+@jwt_required()
+def get_unread_count():
+    """Unread notification count, read from the per-user counter"""
+    return jsonify(unread_count=unread_count(int(get_jwt_identity())))
+
+
+@api.patch("/notifications/<int:notification_id>/read")
 @jwt_required()
 def mark_notification_read(notification_id):
     """Mark notification as read"""
@@ -1968,13 +4382,135 @@ def mark_notification_read(notification_id):
     if notification.user_id != uid:
         return jsonify(error="Not your notification"), 403
 
-    notification.is_read = True
+    mark_notifications_read(uid, Notification.notification_id == notification_id)
     db.session.commit()
 
     return jsonify(message="Marked as read")
 
 
-@app.post("/notifications/send")
+@api.patch("/notifications/read")
+@jwt_required()
+def mark_notifications_read_bulk():
+    """Mark several (notification_ids) or all (all: true) notifications read"""
+    err = json_required()
+    if err:
+        return err
+
+    uid = int(get_jwt_identity())
+    data = request.get_json()
+
+    if data.get("all") is True:
+        updated = mark_notifications_read(uid)
+    else:
+        ids = data.get("notification_ids")
+        if (
+            not isinstance(ids, list)
+            or not ids
+            or not all(isinstance(i, int) for i in ids)
+        ):
+            return jsonify(error="notification_ids must be a list of integers"), 400
+        if len(ids) > NOTIFICATION_BATCH_SIZE:
+            return (
+                jsonify(error=f"At most {NOTIFICATION_BATCH_SIZE} notification_ids"),
+                400,
+            )
+        updated = mark_notifications_read(
+            uid, Notification.notification_id.in_(ids)
+        )
+    db.session.commit()
+
+    return jsonify(updated=updated, unread_count=unread_count(uid))
+
+
+stream_slots = threading.BoundedSemaphore(NOTIFICATION_STREAM_SLOTS)
+
+
+def sse_event(event, data, event_id=None):
+    """Format one Server-Sent Events message"""
+    lines = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{lines}event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def notification_events(uid, last_id):
+    """SSE messages for a user's new notifications and unread count changes"""
+    deadline = monotonic() + NOTIFICATION_STREAM_SECONDS
+    seen_version = seen_unread = None
+    yield f"retry: {int(NOTIFICATION_STREAM_POLL_SECONDS * 1000)}\n\n"
+    while True:
+        # One primary key read per poll; the notifications table is only
+        # queried after the counter shows a change
+        counter = db.session.get(NotificationCounter, uid, populate_existing=True)
+        version, unread = (counter.version, counter.unread) if counter else (0, 0)
+        if version != seen_version:
+            new = (
+                Notification.query.filter(
+                    Notification.user_id == uid,
+                    Notification.notification_id > last_id,
+                )
+                .order_by(Notification.notification_id)
+                .limit(MAX_PAGE_LIMIT)
+                .all()
+            )
+            for n in new:
+                last_id = n.notification_id
+                yield sse_event("notification", notification_json(n), last_id)
+            if len(new) < MAX_PAGE_LIMIT:
+                seen_version = version
+        if unread != seen_unread:
+            seen_unread = unread
+            yield sse_event("unread", {"unread_count": unread})
+        # Hand the connection back to the pool while sleeping
+        db.session.close()
+
+        if monotonic() >= deadline:
+            return
+        sleep(NOTIFICATION_STREAM_POLL_SECONDS)
+        yield ": keepalive\n\n"
+
+
+@api.get("/notifications/stream")
+@jwt_required()
+def notification_stream():
+    """Server-Sent Events stream of new notifications and unread count changes"""
+    uid = int(get_jwt_identity())
+    if not stream_slots.acquire(blocking=False):
+        # Clients fall back to polling /notifications/unread-count
+        return jsonify(error="Too many open streams, retry later"), 503
+
+    # The slot belongs to this request until the response takes it over in
+    # call_on_close; every way out before that must give it back
+    try:
+        try:
+            last_id = int(
+                request.headers.get("Last-Event-ID")
+                or request.args.get("last_event_id")
+                or 0
+            )
+        except ValueError:
+            stream_slots.release()
+            return jsonify(error="Last-Event-ID must be a notification id"), 400
+        if not last_id:
+            last_id = (
+                db.session.query(func.max(Notification.notification_id))
+                .filter(Notification.user_id == uid)
+                .scalar()
+                or 0
+            )
+
+        response = current_app.response_class(
+            stream_with_context(notification_events(uid, last_id)),
+            mimetype="text/event-stream",
+        )
+        response.headers["Cache-Control"] = "no-cache"
+        response.headers["X-Accel-Buffering"] = "no"
+        response.call_on_close(stream_slots.release)
+    except BaseException:
+        stream_slots.release()
+        raise
+    return response
+
+
+@api.post("/notifications/send")
 @require_roles("owner", "admin")
 def send_promotional_notification():
     """Send promotional notifications - Criteria: Notifications #2, #4"""
@@ -1989,18 +4525,15 @@ def send_promotional_notification():
     user_ids = data["user_ids"]
     notification_type = data["type"]
 
+    if not isinstance(user_ids, list):
+        return jsonify(error="user_ids must be a list"), 400
+
     if notification_type not in ["promotion", "discount", "status_update"]:
         return jsonify(error="Invalid notification type"), 400
 
     # Create notifications
-    created = 0
-    for user_id in user_ids:
-        send_notification(
-            user_id=user_id,
-            notification_type=notification_type,
-            message=data["message"],
-        )
-        created += 1
+    created = send_bulk_notifications(user_ids, notification_type, data["message"])
+    db.session.commit()
 
     return jsonify(message=f"Sent {created} notifications", count=created)
 
@@ -2008,7 +4541,7 @@ def send_promotional_notification():
 # ==================== PROMOTIONS ====================
 
 
-@app.post("/salons/<int:salon_id>/promotions")
+@api.post("/salons/<int:salon_id>/promotions")
 @require_roles("owner")
 def create_promotion(salon_id):
     """Create promotional offer"""
@@ -2041,21 +4574,22 @@ def create_promotion(salon_id):
         is_active=data.get("is_active", True),
     )
     db.session.add(promotion)
-    db.session.commit()
 
     # Notify loyal customers
     loyal_customers = (
-        Loyalty.query.filter_by(salon_id=salon_id)
+        db.session.query(Loyalty.user_id)
+        .filter_by(salon_id=salon_id)
         .filter(Loyalty.lifetime_points > 100)
         .all()
     )
 
-    for loyalty in loyal_customers:
-        send_notification(
-            user_id=loyalty.user_id,
-            notification_type="promotion",
-            message=f"{data['description']} - {data['discount_percent']}% off!",
-        )
+    send_bulk_notifications(
+        [user_id for (user_id,) in loyal_customers],
+        "promotion",
+        f"{data['description']} - {data['discount_percent']}% off!",
+    )
+    db.session.commit()
+    invalidate_catalog(salon_id)
 
     return (
         jsonify(
@@ -2066,7 +4600,8 @@ def create_promotion(salon_id):
     )
 
 
-@app.get("/salons/<int:salon_id>/promotions")
+@api.get("/salons/<int:salon_id>/promotions")
+@catalog_cached
 def list_promotions(salon_id):
     """Get active promotions"""
     now = datetime.utcnow()
@@ -2094,10 +4629,436 @@ def list_promotions(salon_id):
     )
 
 
+# ==================== METRICS ROLLUP ====================
+
+APPOINTMENT_STATUSES = ("booked", "completed", "cancelled", "no_show")
+
+# Rollup sources: watermark name -> (bucket date column, change column)
+ROLLUP_SOURCES = {
+    # Appointments change status after booking, so follow updated_at
+    "appointments": (Appointment.scheduled_time, Appointment.updated_at),
+    # ...and a reschedule also leaves stale counts on the day it moved from
+    "appointment_reschedules": (
+        AppointmentReschedule.previous_scheduled_time,
+        AppointmentReschedule.rescheduled_at,
+    ),
+    "orders": (Order.created_at, Order.created_at),
+    "payments": (Payment.created_at, Payment.created_at),
+    "loyalty_transactions": (LoyaltyTransaction.created_at, LoyaltyTransaction.created_at),
+    "users": (User.created_at, User.created_at),
+}
+
+
+def as_date(value):
+    """Normalize a SQL DATE() result (date or 'YYYY-MM-DD' string)"""
+    return value if isinstance(value, date) else date.fromisoformat(str(value)[:10])
+
+
+def changed_since(select_column, change_column, watermark, full=False):
+    """Distinct values of select_column for rows changed after the watermark.
+
+    Rescans ROLLUP_OVERLAP before the watermark so rows committed late by
+    long transactions are still picked up; recomputation is idempotent.
+    Returns (values, newest change value).
+    """
+    query = db.session.query(select_column).distinct()
+    newest = db.session.query(func.max(change_column))
+    if watermark.last_value and not full:
+        since = watermark.last_value - ROLLUP_OVERLAP
+        query = query.filter(change_column > since)
+        newest = newest.filter(change_column > since)
+    return [v for (v,) in query.all() if v is not None], newest.scalar()
+
+
+def rollup_day(day):
+    """Recompute every rollup row for one calendar day"""
+    start = datetime.combine(day, time.min)
+    end = start + timedelta(days=1)
+
+    def in_day(column):
+        return and_(column >= start, column < end)
+
+    salons = {}
+
+    def salon_row(salon_id):
+        return salons.setdefault(
+            salon_id,
+            {
+                "day": day,
+                "salon_id": salon_id,
+                "revenue": 0,
+                "orders": 0,
+                **{f"appointments_{st}": 0 for st in APPOINTMENT_STATUSES},
+                "points_issued": 0,
+                "points_redeemed": 0,
+            },
+        )
+
+    by_status = (
+        db.session.query(
+            Appointment.salon_id,
+            Appointment.status,
+            func.count(Appointment.appointment_id),
+        )
+        .filter(in_day(Appointment.scheduled_time))
+        .group_by(Appointment.salon_id, Appointment.status)
+        .all()
+    )
+    for salon_id, status, count in by_status:
+        salon_row(salon_id)[f"appointments_{status or 'booked'}"] += count
+
+    paid_orders = (
+        db.session.query(
+            Order.salon_id, func.count(Order.order_id), func.sum(Order.total_amount)
+        )
+        .filter(in_day(Order.created_at), Order.payment_status == "paid")
+        .group_by(Order.salon_id)
+        .all()
+    )
+    for salon_id, count, revenue in paid_orders:
+        row = salon_row(salon_id)
+        row["orders"] = count
+        row["revenue"] = revenue or 0
+
+    points = (
+        db.session.query(
+            LoyaltyTransaction.salon_id,
+            func.sum(
+                case((LoyaltyTransaction.points > 0, LoyaltyTransaction.points), else_=0)
+            ),
+            func.sum(
+                case(
+                    (
+                        LoyaltyTransaction.reason == "redemption",
+                        -LoyaltyTransaction.points,
+                    ),
+                    else_=0,
+                )
+            ),
+        )
+        .filter(in_day(LoyaltyTransaction.created_at))
+        .group_by(LoyaltyTransaction.salon_id)
+        .all()
+    )
+    for salon_id, issued, redeemed in points:
+        row = salon_row(salon_id)
+        row["points_issued"] = int(issued or 0)
+        row["points_redeemed"] = int(redeemed or 0)
+
+    hour = extract("hour", Appointment.scheduled_time).label("hour")
+    by_hour = (
+        db.session.query(
+            Appointment.salon_id, hour, func.count(Appointment.appointment_id)
+        )
+        .filter(in_day(Appointment.scheduled_time))
+        .group_by(Appointment.salon_id, hour)
+        .all()
+    )
+
+    payments, revenue = (
+        db.session.query(func.count(Payment.payment_id), func.sum(Payment.amount))
+        .filter(in_day(Payment.created_at), Payment.payment_status == "completed")
+        .one()
+    )
+    new_users = User.query.filter(in_day(User.created_at)).count()
+
+    for model in (DailySalonMetrics, DailyHourlyBookings, DailyPlatformMetrics):
+        model.query.filter_by(day=day).delete(synchronize_session=False)
+
+    if salons:
+        db.session.execute(DailySalonMetrics.__table__.insert(), list(salons.values()))
+    if by_hour:
+        db.session.execute(
+            DailyHourlyBookings.__table__.insert(),
+            [
+                {"day": day, "salon_id": salon_id, "hour": int(h), "appointments": c}
+                for salon_id, h, c in by_hour
+            ],
+        )
+    db.session.add(
+        DailyPlatformMetrics(
+            day=day, new_users=new_users, payments=payments, revenue=revenue or 0
+        )
+    )
+
+
+def rollup_customers(user_ids):
+    """Recompute visit counts for the given customers"""
+    user_ids = list(user_ids)
+    for i in range(0, len(user_ids), 1000):
+        chunk = user_ids[i : i + 1000]
+        rows = (
+            db.session.query(
+                Appointment.user_id,
+                func.count(Appointment.appointment_id),
+                func.min(Appointment.scheduled_time),
+                func.max(Appointment.scheduled_time),
+            )
+            .filter(Appointment.user_id.in_(chunk))
+            .group_by(Appointment.user_id)
+            .all()
+        )
+        CustomerVisitStats.query.filter(CustomerVisitStats.user_id.in_(chunk)).delete(
+            synchronize_session=False
+        )
+        if rows:
+            db.session.execute(
+                CustomerVisitStats.__table__.insert(),
+                [
+                    {"user_id": u, "visits": n, "first_visit": f, "last_visit": l}
+                    for u, n, f, l in rows
+                ],
+            )
+
+
+def refresh_metrics_rollup(full=False):
+    """Bring the rollup tables up to date with rows changed since the last run.
+
+    Only days touched by new or changed rows are recomputed. Returns the
+    number of days and customers refreshed.
+    """
+    now = datetime.utcnow()
+    marks = {m.name: m for m in RollupWatermark.query.all()}
+
+    days = set()
+    newest = {}
+    for name, (date_column, change_column) in ROLLUP_SOURCES.items():
+        mark = marks.get(name) or RollupWatermark(name=name)
+        marks[name] = mark
+        values, newest[name] = changed_since(
+            func.date(date_column), change_column, mark, full=full
+        )
+        days.update(as_date(v) for v in values)
+
+    customers, _ = changed_since(
+        Appointment.user_id, Appointment.updated_at, marks["appointments"], full=full
+    )
+
+    if full:
+        for model in (DailySalonMetrics, DailyHourlyBookings, DailyPlatformMetrics):
+            model.query.delete(synchronize_session=False)
+
+    for day in sorted(days):
+        rollup_day(day)
+    rollup_customers(customers)
+
+    for name, mark in marks.items():
+        if newest.get(name) and (not mark.last_value or newest[name] > mark.last_value):
+            mark.last_value = newest[name]
+        mark.refreshed_at = now
+        db.session.add(mark)
+
+    db.session.commit()
+    return len(days), len(customers)
+
+
+def live_requested():
+    """Admin stats read the rollup unless ?live=true is passed"""
+    return request.args.get("live", "false").lower() == "true"
+
+
+def rollup_as_of():
+    refreshed = db.session.query(func.min(RollupWatermark.refreshed_at)).scalar()
+    return refreshed.isoformat() if refreshed else None
+
+
+def rollup_appointment_total():
+    return sum(
+        getattr(DailySalonMetrics, f"appointments_{st}") for st in APPOINTMENT_STATUSES
+    )
+
+
+def rollup_appointment_stats():
+    totals = (
+        db.session.query(
+            *[
+                func.sum(getattr(DailySalonMetrics, f"appointments_{st}"))
+                for st in APPOINTMENT_STATUSES
+            ]
+        )
+        .one()
+    )
+    by_status = {
+        st: int(count) for st, count in zip(APPOINTMENT_STATUSES, totals) if count
+    }
+
+    peak_hours = (
+        db.session.query(
+            DailyHourlyBookings.hour,
+            func.sum(DailyHourlyBookings.appointments).label("count"),
+        )
+        .group_by(DailyHourlyBookings.hour)
+        .order_by(func.sum(DailyHourlyBookings.appointments).desc())
+        .limit(5)
+        .all()
+    )
+
+    week_start = date.today() - timedelta(days=date.today().weekday())
+    this_week = (
+        db.session.query(func.sum(rollup_appointment_total()))
+        .filter(DailySalonMetrics.day >= week_start)
+        .scalar()
+    )
+
+    return dict(
+        total_appointments=sum(by_status.values()),
+        this_week=int(this_week or 0),
+        by_status=by_status,
+        peak_hours=[{"hour": h, "appointments": int(c)} for h, c in peak_hours],
+    )
+
+
+def rollup_revenue_stats():
+    total_revenue = db.session.query(func.sum(DailyPlatformMetrics.revenue)).scalar()
+
+    revenue = func.sum(DailySalonMetrics.revenue)
+    revenue_by_salon = (
+        db.session.query(Salon.name, revenue.label("revenue"))
+        .join(DailySalonMetrics, DailySalonMetrics.salon_id == Salon.salon_id)
+        .group_by(Salon.salon_id)
+        .having(revenue > 0)
+        .order_by(revenue.desc())
+        .limit(10)
+        .all()
+    )
+
+    six_months_ago = (datetime.utcnow() - timedelta(days=180)).date()
+    monthly_revenue = (
+        db.session.query(
+            func.date_format(DailyPlatformMetrics.day, "%Y-%m").label("month"),
+            func.sum(DailyPlatformMetrics.revenue).label("revenue"),
+        )
+        .filter(
+            DailyPlatformMetrics.day >= six_months_ago,
+            DailyPlatformMetrics.payments > 0,
+        )
+        .group_by("month")
+        .order_by("month")
+        .all()
+    )
+
+    return dict(
+        total_revenue=float(total_revenue or 0),
+        top_salons=[
+            {"salon": name, "revenue": float(rev)} for name, rev in revenue_by_salon
+        ],
+        monthly_trend=[
+            {"month": month, "revenue": float(rev)} for month, rev in monthly_revenue
+        ],
+    )
+
+
+def rollup_loyalty_points():
+    issued, redeemed = db.session.query(
+        func.sum(DailySalonMetrics.points_issued),
+        func.sum(DailySalonMetrics.points_redeemed),
+    ).one()
+    return int(issued or 0), int(redeemed or 0)
+
+
+def rollup_retention_stats():
+    ninety_days_ago = datetime.utcnow() - timedelta(days=90)
+    total, repeat, avg_visits, inactive = db.session.query(
+        func.count(CustomerVisitStats.user_id),
+        func.sum(case((CustomerVisitStats.visits > 1, 1), else_=0)),
+        func.avg(CustomerVisitStats.visits),
+        func.sum(case((CustomerVisitStats.first_visit < ninety_days_ago, 1), else_=0)),
+    ).one()
+
+    repeat = int(repeat or 0)
+    return dict(
+        total_customers=total,
+        repeat_customers=repeat,
+        retention_rate=round((repeat / total * 100) if total > 0 else 0, 2),
+        average_visits_per_customer=round(float(avg_visits or 0), 2),
+        inactive_users_90d=int(inactive or 0),
+    )
+
+
+def rollup_summary_activity(month_start):
+    """One-row derived tables with the rollup's activity totals"""
+    appointments = rollup_appointment_total()
+    this_month = DailySalonMetrics.day >= month_start
+    salon_days = select(
+        func.sum(appointments).label("total_appointments"),
+        func.sum(case((this_month, appointments), else_=0)).label("appointments"),
+    ).subquery()
+
+    this_month = DailyPlatformMetrics.day >= month_start
+    platform_days = select(
+        func.sum(DailyPlatformMetrics.revenue).label("total_revenue"),
+        func.sum(case((this_month, DailyPlatformMetrics.revenue), else_=0)).label(
+            "revenue"
+        ),
+        func.sum(case((this_month, DailyPlatformMetrics.new_users), else_=0)).label(
+            "new_users"
+        ),
+    ).subquery()
+    return [salon_days, platform_days]
+
+
+def live_summary_activity(month_start):
+    """One-row derived tables with the activity totals read from the live tables"""
+    appointments = select(
+        func.count(Appointment.appointment_id).label("total_appointments"),
+        func.sum(case((Appointment.scheduled_time >= month_start, 1), else_=0)).label(
+            "appointments"
+        ),
+    ).subquery()
+
+    completed = Payment.payment_status == "completed"
+    payments = select(
+        func.sum(case((completed, Payment.amount), else_=0)).label("total_revenue"),
+        func.sum(
+            case(
+                (and_(completed, Payment.created_at >= month_start), Payment.amount),
+                else_=0,
+            )
+        ).label("revenue"),
+    ).subquery()
+
+    new_users = (
+        select(func.count(User.user_id).label("new_users"))
+        .where(User.created_at >= month_start)
+        .subquery()
+    )
+    return [appointments, payments, new_users]
+
+
+def summary_report_totals(live):
+    """Every figure of the summary report in a single round trip.
+
+    Each table is read once with conditional aggregation into a one-row
+    derived table, and the derived tables are cross joined into one row.
+    """
+    if live:
+        month_start = datetime.combine(datetime.utcnow().date().replace(day=1), time())
+        activity = live_summary_activity(month_start)
+    else:
+        activity = rollup_summary_activity(date.today().replace(day=1))
+
+    users = select(func.count(User.user_id).label("total_users")).subquery()
+    salons = select(
+        func.count(Salon.salon_id).label("total_salons"),
+        func.sum(case((Salon.status == "active", 1), else_=0)).label("active_salons"),
+    ).subquery()
+    loyalty = select(
+        func.sum(case((Loyalty.points > 0, 1), else_=0)).label("active_members"),
+        func.sum(Loyalty.lifetime_points).label("total_points_issued"),
+    ).subquery()
+
+    derived = [users, salons, loyalty, *activity]
+    joined = derived[0]
+    for table in derived[1:]:
+        joined = joined.join(table, true())
+    row = db.session.execute(select(*derived).select_from(joined)).one()
+    return {key: value or 0 for key, value in row._mapping.items()}
+
+
 # ==================== ADMIN ANALYTICS ====================
 
 
-@app.get("/admin/stats/engagement")
+@api.get("/admin/stats/engagement")
 @require_roles("admin")
 def admin_engagement_stats():
     """User engagement stats - Criteria: Admin #1"""
@@ -2128,10 +5089,15 @@ def admin_engagement_stats():
     )
 
 
-@app.get("/admin/stats/appointments")
+@api.get("/admin/stats/appointments")
 @require_roles("admin")
 def admin_appointment_stats():
     """Appointment trends - Criteria: Admin #2"""
+    if not live_requested():
+        return jsonify(
+            **rollup_appointment_stats(), source="rollup", as_of=rollup_as_of()
+        )
+
     total_appointments = Appointment.query.count()
 
     # Appointments by status
@@ -2167,10 +5133,13 @@ def admin_appointment_stats():
     )
 
 
-@app.get("/admin/stats/revenue")
+@api.get("/admin/stats/revenue")
 @require_roles("admin")
 def admin_revenue_stats():
     """Revenue tracking - Criteria: Admin #3"""
+    if not live_requested():
+        return jsonify(**rollup_revenue_stats(), source="rollup", as_of=rollup_as_of())
+
     # Total revenue
     total_revenue = (
         db.session.query(func.sum(Payment.amount))
@@ -2219,20 +5188,26 @@ def admin_revenue_stats():
     )
 
 
-@app.get("/admin/stats/loyalty")
+@api.get("/admin/stats/loyalty")
 @require_roles("admin")
 def admin_loyalty_stats():
     """Loyalty program usage - Criteria: Admin #4"""
-    total_points_issued = (
-        db.session.query(func.sum(Loyalty.lifetime_points)).scalar() or 0
-    )
-
-    current_points = db.session.query(func.sum(Loyalty.points)).scalar() or 0
-
-    points_redeemed = total_points_issued - current_points
-
-    # Active loyalty members
-    active_members = Loyalty.query.filter(Loyalty.points > 0).count()
+    current_points, active_members = db.session.query(
+        func.sum(Loyalty.points), func.sum(case((Loyalty.points > 0, 1), else_=0))
+    ).one()
+    current_points = int(current_points or 0)
+    active_members = int(active_members or 0)
+
+    if live_requested():
+        total_points_issued = (
+            db.session.query(func.sum(Loyalty.lifetime_points)).scalar() or 0
+        )
+        points_redeemed = total_points_issued - current_points
+        source = {}
+    else:
+        # Daily ledger totals; balances and members are single-row aggregates
+        total_points_issued, points_redeemed = rollup_loyalty_points()
+        source = dict(source="rollup", as_of=rollup_as_of())
 
     # Top loyalty earners
     top_earners = (
@@ -2257,10 +5232,11 @@ def admin_loyalty_stats():
         ),
         active_members=active_members,
         top_earners=[{"name": name, "points": pts} for name, pts in top_earners],
+        **source,
     )
 
 
-@app.get("/admin/stats/demographics")
+@api.get("/admin/stats/demographics")
 @require_roles("admin")
 def admin_demographics():
     """User demographics - Criteria: Admin #5"""
@@ -2289,10 +5265,15 @@ def admin_demographics():
     )
 
 
-@app.get("/admin/stats/retention")
+@api.get("/admin/stats/retention")
 @require_roles("admin")
 def admin_retention():
     """Customer retention metrics - Criteria: Admin #6"""
+    if not live_requested():
+        return jsonify(
+            **rollup_retention_stats(), source="rollup", as_of=rollup_as_of()
+        )
+
     # Users with multiple appointments (repeat customers)
     repeat_customers = (
         db.session.query(
@@ -2337,75 +5318,92 @@ def admin_retention():
     )
 
 
-@app.get("/admin/reports/summary")
+@api.get("/admin/reports/summary")
 @require_roles("admin")
 def admin_summary_report():
     """Generate summary report - Criteria: Admin #7"""
+    totals = summary_report_totals(live_requested())
+
     # Collect all key metrics
     report = {
         "generated_at": datetime.utcnow().isoformat(),
+        "source": "live" if live_requested() else "rollup",
         "overview": {
-            "total_users": User.query.count(),
-            "total_salons": Salon.query.count(),
-            "active_salons": Salon.query.filter_by(status="active").count(),
-            "total_appointments": Appointment.query.count(),
-            "total_revenue": float(
-                db.session.query(func.sum(Payment.amount))
-                .filter(Payment.payment_status == "completed")
-                .scalar()
-                or 0
-            ),
+            "total_users": totals["total_users"],
+            "total_salons": totals["total_salons"],
+            "active_salons": int(totals["active_salons"]),
+            "total_appointments": int(totals["total_appointments"]),
+            "total_revenue": float(totals["total_revenue"]),
         },
         "this_month": {
-            "new_users": User.query.filter(
-                User.created_at >= datetime.utcnow().replace(day=1)
-            ).count(),
-            "appointments": Appointment.query.filter(
-                Appointment.scheduled_time >= datetime.utcnow().replace(day=1)
-            ).count(),
-            "revenue": float(
-                db.session.query(func.sum(Payment.amount))
-                .filter(
-                    and_(
-                        Payment.payment_status == "completed",
-                        Payment.created_at >= datetime.utcnow().replace(day=1),
-                    )
-                )
-                .scalar()
-                or 0
-            ),
+            "new_users": int(totals["new_users"]),
+            "appointments": int(totals["appointments"]),
+            "revenue": float(totals["revenue"]),
         },
         "loyalty": {
-            "active_members": Loyalty.query.filter(Loyalty.points > 0).count(),
-            "total_points_issued": db.session.query(
-                func.sum(Loyalty.lifetime_points)
-            ).scalar()
-            or 0,
+            "active_members": int(totals["active_members"]),
+            "total_points_issued": int(totals["total_points_issued"]),
         },
     }
 
     return jsonify(report)
 
 
-@app.get("/admin/system/health")
+HEALTH_COUNT_MODELS = {
+    "users": User,
+    "salons": Salon,
+    "appointments": Appointment,
+    "payments": Payment,
+}
+
+
+def exact_row_counts(models):
+    """COUNT(*) of each table, all in one statement"""
+    counts = [
+        select(func.count()).select_from(model).scalar_subquery().label(name)
+        for name, model in models.items()
+    ]
+    return dict(db.session.execute(select(*counts)).one()._mapping)
+
+
+def approximate_row_counts(models):
+    """Row estimates from the optimizer statistics, or None when unavailable.
+
+    On MySQL these come from information_schema and cost no table scan; for
+    InnoDB they can be off by tens of percent.
+    """
+    if db.engine.dialect.name != "mysql":
+        return None
+    tables = {model.__tablename__: name for name, model in models.items()}
+    rows = db.session.execute(
+        text(
+            "SELECT TABLE_NAME, TABLE_ROWS FROM information_schema.TABLES "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME IN :tables"
+        ).bindparams(bindparam("tables", expanding=True)),
+        {"tables": list(tables)},
+    )
+    return {tables[table]: int(estimate or 0) for table, estimate in rows}
+
+
+@api.get("/admin/system/health")
 @require_roles("admin")
 def admin_system_health():
     """Monitor system health - Criteria: Admin #8"""
+    approximate = request.args.get("approximate", "false").lower() == "true"
+
+    # The count query doubles as the database connection test
+    record_counts = None
     try:
-        # Test database connection
-        db.session.execute("SELECT 1")
+        if approximate:
+            record_counts = approximate_row_counts(HEALTH_COUNT_MODELS)
+        if record_counts is None:
+            approximate = False
+            record_counts = exact_row_counts(HEALTH_COUNT_MODELS)
         db_status = "healthy"
     except Exception as e:
+        db.session.rollback()
         db_status = f"error: {str(e)}"
 
-    # Count records
-    record_counts = {
-        "users": User.query.count(),
-        "salons": Salon.query.count(),
-        "appointments": Appointment.query.count(),
-        "payments": Payment.query.count(),
-    }
-
     # Recent errors (you'd need an error log table for this)
     # Simplified version
 
@@ -2414,33 +5412,364 @@ def admin_system_health():
         timestamp=datetime.utcnow().isoformat(),
         database=db_status,
         record_counts=record_counts,
+        record_counts_approximate=approximate,
         uptime="Operational",
     )
 
 
+# ==================== EXPORTS ====================
+
+
+def appointments_export(salon_id=None, start=None, end=None):
+    """Appointment rows for export, filtered on scheduled_time"""
+    combo_service = aliased(Service)
+    combo_names = (
+        select(func.aggregate_strings(combo_service.custom_name, ", "))
+        .select_from(AppointmentService)
+        .join(combo_service, combo_service.service_id == AppointmentService.service_id)
+        .where(AppointmentService.appointment_id == Appointment.appointment_id)
+        .correlate(Appointment)
+        .scalar_subquery()
+    )
+    stmt = (
+        select(
+            Appointment.appointment_id,
+            Appointment.salon_id,
+            Appointment.user_id,
+            Appointment.staff_id,
+            Appointment.service_id,
+            func.coalesce(combo_names, Service.custom_name).label("service_name"),
+            Appointment.scheduled_time,
+            Appointment.status,
+            Appointment.price,
+            Appointment.created_at,
+        )
+        .outerjoin(Service, Service.service_id == Appointment.service_id)
+        .order_by(Appointment.appointment_id)
+    )
+    if salon_id:
+        stmt = stmt.where(Appointment.salon_id == salon_id)
+    if start:
+        stmt = stmt.where(Appointment.scheduled_time >= start)
+    if end:
+        stmt = stmt.where(Appointment.scheduled_time < end)
+    return stmt
+
+
+def payments_export(salon_id=None, start=None, end=None):
+    """Payment rows for export, attributed to the salon of their appointment or order"""
+    salon = func.coalesce(Appointment.salon_id, Order.salon_id)
+    stmt = (
+        select(
+            Payment.payment_id,
+            salon.label("salon_id"),
+            Payment.user_id,
+            Payment.appointment_id,
+            Order.order_id,
+            Payment.amount,
+            Payment.payment_method,
+            Payment.payment_status,
+            Payment.transaction_ref,
+            Payment.created_at,
+        )
+        .outerjoin(Appointment, Appointment.appointment_id == Payment.appointment_id)
+        .outerjoin(Order, Order.payment_id == Payment.payment_id)
+        .order_by(Payment.payment_id)
+    )
+    if salon_id:
+        # one arm per indexed path; a filter on the coalesced salon column
+        # can use neither index and scans every payment
+        salon_payments = union(
+            select(Payment.payment_id)
+            .join(Appointment, Appointment.appointment_id == Payment.appointment_id)
+            .where(Appointment.salon_id == salon_id),
+            select(Order.payment_id).where(
+                Order.salon_id == salon_id, Order.payment_id.isnot(None)
+            ),
+        ).subquery()
+        stmt = stmt.join(
+            salon_payments, salon_payments.c.payment_id == Payment.payment_id
+        )
+    if start:
+        stmt = stmt.where(Payment.created_at >= start)
+    if end:
+        stmt = stmt.where(Payment.created_at < end)
+    return stmt
+
+
+def orders_export(salon_id=None, start=None, end=None):
+    """Order rows for export, filtered on created_at"""
+    stmt = select(
+        Order.order_id,
+        Order.salon_id,
+        Order.user_id,
+        Order.payment_id,
+        Order.total_amount,
+        Order.payment_status,
+        Order.order_status,
+        Order.created_at,
+    ).order_by(Order.order_id)
+    if salon_id:
+        stmt = stmt.where(Order.salon_id == salon_id)
+    if start:
+        stmt = stmt.where(Order.created_at >= start)
+    if end:
+        stmt = stmt.where(Order.created_at < end)
+    return stmt
+
+
+EXPORTS = {
+    "appointments": appointments_export,
+    "payments": payments_export,
+    "orders": orders_export,
+}
+
+EXPORT_FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+
+def export_value(value):
+    """Plain CSV/JSON value for a column value"""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def export_params():
+    """Parse ?format=, ?from= and ?to= (inclusive days).
+
+    Returns (format, start, end, error_response).
+    """
+    fmt = request.args.get("format", "csv")
+    if fmt not in EXPORT_FORMATS:
+        return None, None, None, (jsonify(error="format must be csv or ndjson"), 400)
+    try:
+        start = request.args.get("from")
+        start = datetime.strptime(start, "%Y-%m-%d") if start else None
+        end = request.args.get("to")
+        end = datetime.strptime(end, "%Y-%m-%d") + timedelta(days=1) if end else None
+    except ValueError:
+        return None, None, None, (jsonify(error="from and to must be YYYY-MM-DD"), 400)
+    return fmt, start, end, None
+
+
+def stream_export(stmt, fmt, filename):
+    """Stream a SELECT as CSV or NDJSON without loading it into memory.
+
+    The rows come from a server-side cursor in EXPORT_BATCH_SIZE batches and
+    each batch is written out as one chunk, so memory stays flat no matter how
+    many rows match. The cursor holds a pooled connection until the download
+    finishes.
+    """
+    columns = [c.key for c in stmt.selected_columns]
+
+    def generate():
+        result = db.session.execute(
+            stmt.execution_options(yield_per=EXPORT_BATCH_SIZE)
+        )
+        try:
+            buf = io.StringIO()
+            writer = csv.writer(buf)
+            if fmt == "csv":
+                writer.writerow(columns)
+            for rows in result.partitions():
+                for row in rows:
+                    values = [export_value(v) for v in row]
+                    if fmt == "csv":
+                        writer.writerow(values)
+                    else:
+                        buf.write(json.dumps(dict(zip(columns, values))))
+                        buf.write("\n")
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate()
+            yield buf.getvalue()
+        finally:
+            result.close()
+
+    response = current_app.response_class(
+        stream_with_context(generate()), mimetype=EXPORT_FORMATS[fmt]
+    )
+    response.headers["Content-Disposition"] = (
+        f'attachment; filename="{filename}.{fmt}"'
+    )
+    # Let a buffering reverse proxy pass chunks through as they are written
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+
+@api.get("/admin/exports/<dataset>")
+@require_roles("admin")
+def admin_export(dataset):
+    """Export appointments, payments or orders, optionally for one salon"""
+    if dataset not in EXPORTS:
+        return jsonify(error="Unknown export", exports=sorted(EXPORTS)), 404
+    fmt, start, end, err = export_params()
+    if err:
+        return err
+
+    salon_id = request.args.get("salon_id", type=int)
+    stmt = EXPORTS[dataset](salon_id, start, end)
+    filename = f"{dataset}-salon-{salon_id}" if salon_id else dataset
+    return stream_export(stmt, fmt, filename)
+
+
+@api.get("/salons/<int:salon_id>/exports/<dataset>")
+@require_roles("owner", "admin")
+def salon_export(salon_id, dataset):
+    """Export a salon's appointments, payments or orders for accounting"""
+    if dataset not in EXPORTS:
+        return jsonify(error="Unknown export", exports=sorted(EXPORTS)), 404
+    principal = g.principal
+    if principal.role == "owner" and salon_id not in principal.salon_ids:
+        return jsonify(error="Not your salon"), 403
+    fmt, start, end, err = export_params()
+    if err:
+        return err
+
+    stmt = EXPORTS[dataset](salon_id, start, end)
+    return stream_export(stmt, fmt, f"{dataset}-salon-{salon_id}")
+
+
+@api.get("/salons/<int:salon_id>/customers/<int:customer_id>/history/export")
+@require_roles("owner", "staff")
+def customer_history_export(salon_id, customer_id):
+    """Export a customer's full visit history at a salon"""
+    principal = g.principal
+    if principal.role == "owner" and salon_id not in principal.salon_ids:
+        return jsonify(error="Not your salon"), 403
+    elif principal.role == "staff" and salon_id not in principal.staff_salon_ids:
+        return jsonify(error="Not staff at this salon"), 403
+    fmt, start, end, err = export_params()
+    if err:
+        return err
+
+    stmt = appointments_export(salon_id, start, end).where(
+        Appointment.user_id == customer_id
+    )
+    return stream_export(stmt, fmt, f"history-salon-{salon_id}-customer-{customer_id}")
+
+
+# ==================== CLI COMMANDS ====================
+
+
+def rebuild_rating_table(model, review_column):
+    """Recompute one rating aggregate table from the reviews table"""
+    rows = (
+        db.session.query(
+            review_column,
+            func.count(Review.review_id),
+            func.sum(Review.rating),
+            *[func.sum(case((Review.rating == n, 1), else_=0)) for n in range(1, 6)],
+        )
+        .filter(review_column.isnot(None))
+        .group_by(review_column)
+        .all()
+    )
+
+    db.session.query(model).delete()
+    if rows:
+        db.session.execute(
+            model.__table__.insert(),
+            [
+                {
+                    review_column.key: key,
+                    "average_rating": round(Decimal(total) / count, 2),
+                    "review_count": count,
+                    "rating_sum": total,
+                    **{f"stars_{n}": int(stars[n - 1]) for n in range(1, 6)},
+                }
+                for key, count, total, *stars in rows
+            ],
+        )
+    return len(rows)
+
+
+@api.cli.command("rollup-metrics")
+@click.option("--full", is_flag=True, help="Rebuild every day instead of new changes")
+def rollup_metrics_command(full):
+    """Refresh the daily metrics rollup used by the admin analytics endpoints"""
+    days, customers = refresh_metrics_rollup(full=full)
+    print(f"Rolled up {days} days and {customers} customers")
+
+
+@api.cli.command("rebuild-ratings")
+def rebuild_ratings_command():
+    """Rebuild salon and staff rating aggregates from reviews"""
+    salons = rebuild_rating_table(SalonRating, Review.salon_id)
+    staff = rebuild_rating_table(StaffRating, Review.staff_id)
+    db.session.commit()
+    print(f"Rebuilt ratings for {salons} salons and {staff} staff")
+
+
+@api.cli.command("rebuild-notification-counters")
+def rebuild_notification_counters_command():
+    """Recount every user's unread notifications into notification_counters"""
+    unread = func.sum(case((Notification.is_read == false(), 1), else_=0))
+    counts = dict(
+        db.session.query(Notification.user_id, unread)
+        .group_by(Notification.user_id)
+        .all()
+    )
+    db.session.execute(
+        update(NotificationCounter)
+        .values(unread=0, version=NotificationCounter.version + 1)
+        .execution_options(synchronize_session=False)
+    )
+    for user_ids in (
+        list(counts)[i : i + NOTIFICATION_BATCH_SIZE]
+        for i in range(0, len(counts), NOTIFICATION_BATCH_SIZE)
+    ):
+        db.session.execute(unread_counter_upsert({u: counts[u] for u in user_ids}))
+    db.session.commit()
+    print(f"Rebuilt unread counters for {len(counts)} users")
+
+
+@api.cli.command("purge-idempotency-keys")
+def purge_idempotency_keys_command():
+    """Delete idempotency keys older than IDEMPOTENCY_KEY_TTL_HOURS"""
+    cutoff = datetime.utcnow() - IDEMPOTENCY_KEY_TTL
+    deleted = IdempotencyKey.query.filter(IdempotencyKey.created_at < cutoff).delete(
+        synchronize_session=False
+    )
+    db.session.commit()
+    print(f"Purged {deleted} idempotency keys")
+
+
 # ==================== ERROR HANDLERS ====================
 
 
-@app.errorhandler(404)
+@api.app_errorhandler(404)
 def not_found(error):
     return jsonify(error="Resource not found"), 404
 
 
-@app.errorhandler(500)
+@api.app_errorhandler(500)
 def internal_error(error):
     db.session.rollback()
     return jsonify(error="Internal server error"), 500
 
 
-@app.errorhandler(403)
+@api.app_errorhandler(403)
 def forbidden(error):
     return jsonify(error="Forbidden"), 403
 
 
+@api.app_errorhandler(PasswordHasherBusy)
+def password_hasher_busy(error):
+    return (
+        jsonify(error="Too many sign-ins in progress, retry shortly"),
+        429,
+        {"Retry-After": "1"},
+    )
+
+
 # ==================== MAIN ====================
 
 if __name__ == "__main__":
-    debug = os.getenv("APP_DEBUG", "true").lower() == "true"
+    # Development server only; production runs under gunicorn (gunicorn.conf.py)
+    debug = os.getenv("APP_DEBUG", "false").lower() == "true"
     host = os.getenv("APP_HOST", "0.0.0.0")
     port = int(os.getenv("APP_PORT", "5000"))
 
@@ -2452,4 +5781,4 @@ if __name__ == "__main__":
     print(f"Database: {DB_NAME}")
     print(f"{'='*60}\n")
 
-    app.run(host=host, port=port, debug=debug)
+    create_app().run(host=host, port=port, debug=debug)
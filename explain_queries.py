@@ -0,0 +1,171 @@
+# explain_queries.py Query plan check for the read routes
+#
+# Run with: python -m explain_queries [--ignore-table NAME ...]
+#
+# Calls every GET route against the configured (seeded) database, captures
+# the SELECTs each one issues and runs EXPLAIN on them. Exits non-zero when
+# any of them full-scans a table. Tables small enough that the planner
+# prefers a scan (lookup tables in a thin seed) can be skipped with
+# --ignore-table.
+import argparse
+import sys
+from datetime import date, timedelta
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+
+from app import (
+    create_app,
+    db,
+    Appointment,
+    Salon,
+    Service,
+    Staff,
+)
+
+# (path, role whose token the request carries)
+ROUTES = [
+    ("/salons", None),
+    ("/salons/{salon_id}", None),
+    ("/salons/{salon_id}/staff", None),
+    ("/salons/{salon_id}/services", None),
+    ("/salons/{salon_id}/products", None),
+    ("/salons/{salon_id}/reviews", None),
+    ("/salons/{salon_id}/promotions", None),
+    ("/salons/{salon_id}/slots?service_id={service_id}&from={today}", None),
+    ("/services/search?q=cut", None),
+    ("/services/search?sort=rating", None),
+    ("/staff/{staff_id}/availability", None),
+    ("/staff/{staff_id}/appointments", "staff"),
+    ("/staff/{staff_id}/appointments?from={today}&to={week_end}", "staff"),
+    ("/salons/{salon_id}/schedule?from={today}&to={week_end}", "owner"),
+    ("/salons/{salon_id}/customers/{customer_id}/history", "owner"),
+    ("/auth/me", "customer"),
+    ("/appointments", "customer"),
+    ("/users/me/appointments", "customer"),
+    ("/carts/active", "customer"),
+    ("/loyalty", "customer"),
+    ("/loyalty/{salon_id}", "customer"),
+    ("/notifications", "customer"),
+    ("/notifications/unread-count", "customer"),
+]
+
+
+def load_fixture():
+    """Pick ids from the seeded data to fill the route templates"""
+    appt = (
+        Appointment.query.join(Salon, Salon.salon_id == Appointment.salon_id)
+        .filter(Salon.status == "active", Appointment.staff_id.isnot(None))
+        .first()
+    )
+    if not appt:
+        return None
+    staff = Staff.query.get(appt.staff_id)
+    service = Service.query.filter_by(salon_id=appt.salon_id, is_active=True).first()
+    return {
+        "salon_id": appt.salon_id,
+        "staff_id": appt.staff_id,
+        "service_id": service.service_id if service else 0,
+        "customer_id": appt.user_id,
+        "today": date.today().isoformat(),
+        "week_end": (date.today() + timedelta(days=6)).isoformat(),
+        "users": {
+            "customer": appt.user_id,
+            "staff": staff.user_id,
+            "owner": appt.salon.owner_id,
+        },
+    }
+
+
+def full_scans(conn, statement, parameters):
+    """Return the tables a statement reads without an index"""
+    dialect = conn.dialect.name
+    if dialect == "mysql":
+        rows = conn.exec_driver_sql("EXPLAIN " + statement, parameters).mappings()
+        return [
+            row["table"]
+            for row in rows
+            if row["type"] == "ALL" and not (row["table"] or "").startswith("<")
+        ]
+    if dialect == "sqlite":
+        rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)
+        scans = []
+        for row in rows:
+            detail = row[-1]
+            if not detail.startswith("SCAN ") or "INDEX" in detail:
+                continue
+            table = detail.split()[1]
+            if table != "CONSTANT" and not table.startswith("anon_"):
+                scans.append(table)
+        return scans
+    raise SystemExit(f"EXPLAIN check does not support the {dialect} dialect")
+
+
+def run(ignore_tables):
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            captured.append((statement, parameters))
+
+    app = create_app()
+    with app.app_context():
+        fixture = load_fixture()
+        if not fixture:
+            print("no appointments with an active salon and staff; seed the database first")
+            return 2
+        tokens = {
+            role: create_access_token(identity=str(uid))
+            for role, uid in fixture["users"].items()
+        }
+
+        event.listen(db.engine, "before_cursor_execute", capture)
+        client = app.test_client()
+        failures = 0
+        try:
+            for template, role in ROUTES:
+                path = template.format(**fixture)
+                headers = {"Authorization": f"Bearer {tokens[role]}"} if role else {}
+                captured.clear()
+                resp = client.get(path, headers=headers)
+                queries = {(s, repr(p)): (s, p) for s, p in captured}.values()
+                print(f"{resp.status_code} GET {path} ({len(queries)} queries)")
+
+                # End the session's transaction; on SQLite it holds the write
+                # lock the EXPLAIN connection needs
+                db.session.remove()
+                with db.engine.connect() as conn:
+                    for statement, parameters in queries:
+                        scanned = [
+                            t for t in full_scans(conn, statement, parameters)
+                            if t not in ignore_tables
+                        ]
+                        if scanned:
+                            failures += 1
+                            print(f"  FULL SCAN {', '.join(scanned)}: {statement}")
+        finally:
+            event.remove(db.engine, "before_cursor_execute", capture)
+
+    if failures:
+        print(f"{failures} queries full-scan a table")
+        return 1
+    print("all route queries use an index")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Fail if any read route query full-scans a table"
+    )
+    parser.add_argument(
+        "--ignore-table",
+        action="append",
+        default=[],
+        help="table (or alias) allowed to be scanned; repeatable",
+    )
+    args = parser.parse_args()
+    sys.exit(run(set(args.ignore_table)))
+
+
+if __name__ == "__main__":
+    main()
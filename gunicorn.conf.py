@@ -0,0 +1,42 @@
+# gunicorn.conf.py Production server settings
+#
+# Run with: gunicorn -c gunicorn.conf.py
+# Graceful reload: kill -HUP <master pid> (workers finish in-flight requests)
+import multiprocessing
+import os
+
+wsgi_app = "wsgi:app"
+bind = f"{os.getenv('APP_HOST', '0.0.0.0')}:{os.getenv('APP_PORT', '5000')}"
+
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+worker_class = "gthread" if threads > 1 else "sync"
+
+# Import the app once in the master and fork workers from it. HUP then only
+# restarts workers; set GUNICORN_PRELOAD=false to pick up code changes on HUP.
+preload_app = os.getenv("GUNICORN_PRELOAD", "true").lower() == "true"
+
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+
+# Recycle workers periodically so slow leaks cannot accumulate
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "10000"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "1000"))
+
+accesslog = "-"
+errorlog = "-"
+
+# app.py splits SQLALCHEMY_POOL_SIZE across this many workers and gives each
+# at least one pooled connection per thread
+os.environ["WEB_CONCURRENCY"] = str(workers)
+os.environ["GUNICORN_THREADS"] = str(threads)
+
+
+def on_starting(server):
+    """Start each server run with empty per-worker metrics files"""
+    directory = os.getenv("METRICS_DIR")
+    if directory and os.path.isdir(directory):
+        for name in os.listdir(directory):
+            if name.endswith(".json"):
+                os.remove(os.path.join(directory, name))
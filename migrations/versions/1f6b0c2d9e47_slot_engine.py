@@ -0,0 +1,57 @@
+"""staff time off and one row per service in an appointment
+
+Revision ID: 1f6b0c2d9e47
+Revises: 
+Create Date: 2026-10-17 23:01:00.000000
+
+Databases built from sql-schema-salon.sql already have staff_time_off and
+unique_appt_service, so the live schema is checked first and only what is
+missing is created. Downgrading removes both either way, back to the model
+schema this chain starts from.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1f6b0c2d9e47'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    tables = set(inspector.get_table_names())
+
+    if 'staff_time_off' not in tables:
+        op.create_table('staff_time_off',
+        sa.Column('timeoff_id', sa.Integer(), nullable=False),
+        sa.Column('staff_id', sa.Integer(), nullable=False),
+        sa.Column('start_datetime', sa.DateTime(), nullable=False),
+        sa.Column('end_datetime', sa.DateTime(), nullable=False),
+        sa.Column('reason', sa.String(length=255), nullable=True),
+        sa.Column('approved_by', sa.Integer(), nullable=True),
+        sa.Column('status', sa.Enum('pending', 'approved', 'rejected'), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['approved_by'], ['users.user_id'], ),
+        sa.ForeignKeyConstraint(['staff_id'], ['staff.staff_id'], ),
+        sa.PrimaryKeyConstraint('timeoff_id')
+        )
+        op.create_index('idx_staff_timeoff_staff', 'staff_time_off', ['staff_id'])
+
+    uniques = {u['name'] for u in inspector.get_unique_constraints('appointment_services')}
+    if 'unique_appt_service' not in uniques:
+        with op.batch_alter_table('appointment_services', schema=None) as batch_op:
+            batch_op.create_unique_constraint('unique_appt_service', ['appointment_id', 'service_id'])
+
+
+def downgrade():
+    with op.batch_alter_table('appointment_services', schema=None) as batch_op:
+        if op.get_bind().dialect.name == 'mysql':
+            # The appointment_id FK needs an index once the key is gone
+            batch_op.create_index('appointment_id', ['appointment_id'], unique=False)
+        batch_op.drop_constraint('unique_appt_service', type_='unique')
+
+    op.drop_table('staff_time_off')
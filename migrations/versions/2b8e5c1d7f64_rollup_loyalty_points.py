@@ -0,0 +1,30 @@
+"""loyalty points in the daily salon rollup
+
+Revision ID: 2b8e5c1d7f64
+Revises: 6e0b9d2f4a81
+Create Date: 2026-10-18 10:30:00.000000
+
+Existing days read 0 until `flask rollup-metrics --full` recomputes them.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2b8e5c1d7f64'
+down_revision = '6e0b9d2f4a81'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('daily_salon_metrics', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('points_issued', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('points_redeemed', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('daily_salon_metrics', schema=None) as batch_op:
+        batch_op.drop_column('points_redeemed')
+        batch_op.drop_column('points_issued')
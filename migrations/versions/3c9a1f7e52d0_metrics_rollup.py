@@ -0,0 +1,80 @@
+"""daily metrics rollup tables
+
+Revision ID: 3c9a1f7e52d0
+Revises: 9c4e7a2b6d15
+Create Date: 2026-10-17 23:05:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c9a1f7e52d0'
+down_revision = '9c4e7a2b6d15'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    tables = set(inspector.get_table_names())
+
+    if 'daily_salon_metrics' not in tables:
+        op.create_table('daily_salon_metrics',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('salon_id', sa.Integer(), nullable=False),
+        sa.Column('revenue', sa.Numeric(precision=12, scale=2), nullable=False),
+        sa.Column('orders', sa.Integer(), nullable=False),
+        sa.Column('appointments_booked', sa.Integer(), nullable=False),
+        sa.Column('appointments_completed', sa.Integer(), nullable=False),
+        sa.Column('appointments_cancelled', sa.Integer(), nullable=False),
+        sa.Column('appointments_no_show', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['salon_id'], ['salons.salon_id'], ),
+        sa.PrimaryKeyConstraint('day', 'salon_id')
+        )
+
+    if 'daily_hourly_bookings' not in tables:
+        op.create_table('daily_hourly_bookings',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('salon_id', sa.Integer(), nullable=False),
+        sa.Column('hour', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('appointments', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['salon_id'], ['salons.salon_id'], ),
+        sa.PrimaryKeyConstraint('day', 'salon_id', 'hour')
+        )
+
+    if 'daily_platform_metrics' not in tables:
+        op.create_table('daily_platform_metrics',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('new_users', sa.Integer(), nullable=False),
+        sa.Column('payments', sa.Integer(), nullable=False),
+        sa.Column('revenue', sa.Numeric(precision=12, scale=2), nullable=False),
+        sa.PrimaryKeyConstraint('day')
+        )
+
+    if 'customer_visit_stats' not in tables:
+        op.create_table('customer_visit_stats',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('visits', sa.Integer(), nullable=False),
+        sa.Column('first_visit', sa.DateTime(), nullable=True),
+        sa.Column('last_visit', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ),
+        sa.PrimaryKeyConstraint('user_id')
+        )
+
+    if 'rollup_watermarks' not in tables:
+        op.create_table('rollup_watermarks',
+        sa.Column('name', sa.String(length=50), nullable=False),
+        sa.Column('last_value', sa.DateTime(), nullable=True),
+        sa.Column('refreshed_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('name')
+        )
+
+
+def downgrade():
+    op.drop_table('rollup_watermarks')
+    op.drop_table('customer_visit_stats')
+    op.drop_table('daily_platform_metrics')
+    op.drop_table('daily_hourly_bookings')
+    op.drop_table('daily_salon_metrics')
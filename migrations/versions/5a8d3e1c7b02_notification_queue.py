@@ -0,0 +1,58 @@
+"""notification delivery queue with retry bookkeeping
+
+Revision ID: 5a8d3e1c7b02
+Revises: 1f6b0c2d9e47
+Create Date: 2026-10-17 23:02:00.000000
+
+Databases built from sql-schema-salon.sql already have notification_queue;
+they only get the type, attempts and last_error columns it lacks.
+Downgrading drops the table either way.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5a8d3e1c7b02'
+down_revision = '1f6b0c2d9e47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    tables = set(inspector.get_table_names())
+
+    if 'notification_queue' not in tables:
+        op.create_table('notification_queue',
+        sa.Column('queue_id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('type', sa.Enum('reminder', 'promotion', 'status_update', 'discount'), nullable=False),
+        sa.Column('message', sa.Text(), nullable=False),
+        sa.Column('delivery_method', sa.Enum('email', 'sms', 'push'), nullable=True),
+        sa.Column('scheduled_for', sa.DateTime(), nullable=False),
+        sa.Column('sent', sa.Boolean(), nullable=True),
+        sa.Column('attempts', sa.Integer(), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ),
+        sa.PrimaryKeyConstraint('queue_id')
+        )
+        op.create_index('ix_notification_queue_user_id', 'notification_queue', ['user_id'])
+        op.create_index('ix_notification_queue_scheduled_for', 'notification_queue', ['scheduled_for'])
+    else:
+        columns = {c['name'] for c in inspector.get_columns('notification_queue')}
+        if 'type' not in columns:
+            op.add_column('notification_queue', sa.Column(
+                'type', sa.Enum('reminder', 'promotion', 'status_update', 'discount'),
+                nullable=False, server_default='status_update'))
+        if 'attempts' not in columns:
+            op.add_column('notification_queue', sa.Column(
+                'attempts', sa.Integer(), nullable=True, server_default='0'))
+        if 'last_error' not in columns:
+            op.add_column('notification_queue', sa.Column('last_error', sa.Text(), nullable=True))
+
+
+def downgrade():
+    op.drop_table('notification_queue')
@@ -0,0 +1,27 @@
+"""payments appointment index
+
+Revision ID: 6e0b9d2f4a81
+Revises: b7c2e9d40f16
+Create Date: 2026-10-18 10:10:00.000000
+
+The payments export filters a salon through the payment's appointment
+or order; this index serves the appointment side.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6e0b9d2f4a81'
+down_revision = 'b7c2e9d40f16'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('idx_payments_appointment', 'payments', ['appointment_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('idx_payments_appointment', table_name='payments')
@@ -0,0 +1,70 @@
+"""secondary indexes for the route query patterns
+
+Revision ID: 8e4b27d1a6c3
+Revises: 3c9a1f7e52d0
+Create Date: 2026-10-17 23:10:00.000000
+
+Each index backs a WHERE/ORDER BY used by a route, the slot engine or the
+metrics rollup; the leading columns follow the equality filters and the
+trailing column the range or sort. Verify with `python -m explain_queries`.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8e4b27d1a6c3'
+down_revision = '3c9a1f7e52d0'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ('idx_appointments_staff_time_status', 'appointments', ['staff_id', 'scheduled_time', 'status']),
+    ('idx_appointments_user_time', 'appointments', ['user_id', 'scheduled_time']),
+    ('idx_appointments_salon_user_time', 'appointments', ['salon_id', 'user_id', 'scheduled_time']),
+    ('idx_appointments_scheduled_time', 'appointments', ['scheduled_time']),
+    ('idx_appointments_updated_at', 'appointments', ['updated_at']),
+    ('idx_staff_availability_staff', 'staff_availability', ['staff_id', 'is_available']),
+    ('idx_reviews_salon_created', 'reviews', ['salon_id', 'created_at']),
+    ('idx_notifications_user_sent', 'notifications', ['user_id', 'sent_at']),
+    ('idx_notif_queue_due', 'notification_queue', ['sent', 'scheduled_for']),
+    ('idx_carts_user_status_salon', 'carts', ['user_id', 'status', 'salon_id']),
+    ('ix_cart_items_cart_id', 'cart_items', ['cart_id']),
+    ('idx_payments_status_created', 'payments', ['payment_status', 'created_at']),
+    ('idx_orders_status_created', 'orders', ['payment_status', 'created_at']),
+    ('idx_orders_salon_status', 'orders', ['salon_id', 'payment_status']),
+    ('idx_salons_status', 'salons', ['status', 'salon_id']),
+    ('idx_salons_owner', 'salons', ['owner_id']),
+    ('idx_staff_salon_active', 'staff', ['salon_id', 'is_active']),
+    ('idx_staff_user', 'staff', ['user_id']),
+    ('idx_staff_service_service', 'staff_service', ['service_id']),
+    ('idx_services_salon_active', 'services', ['salon_id', 'is_active', 'service_id']),
+    ('idx_products_salon_active', 'products', ['salon_id', 'is_active', 'product_id']),
+    ('idx_promotions_salon_active', 'promotions', ['salon_id', 'is_active', 'valid_until']),
+    ('idx_users_created_at', 'users', ['created_at']),
+]
+
+
+def upgrade():
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, unique=False)
+
+    # One settings row per salon; databases built from the SQL dump already
+    # have this key, which also indexes the salon_id lookups
+    uniques = {u['name'] for u in sa.inspect(op.get_bind()).get_unique_constraints('salon_settings')}
+    if 'unique_salon_setting' not in uniques:
+        with op.batch_alter_table('salon_settings', schema=None) as batch_op:
+            batch_op.create_unique_constraint('unique_salon_setting', ['salon_id'])
+
+
+def downgrade():
+    with op.batch_alter_table('salon_settings', schema=None) as batch_op:
+        if op.get_bind().dialect.name == 'mysql':
+            # The salon_id FK needs an index once the key is gone
+            batch_op.create_index('salon_id', ['salon_id'], unique=False)
+        batch_op.drop_constraint('unique_salon_setting', type_='unique')
+
+    for name, table, columns in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
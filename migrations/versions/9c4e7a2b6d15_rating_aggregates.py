@@ -0,0 +1,55 @@
+"""salon and staff rating aggregates
+
+Revision ID: 9c4e7a2b6d15
+Revises: 5a8d3e1c7b02
+Create Date: 2026-10-17 23:03:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c4e7a2b6d15'
+down_revision = '5a8d3e1c7b02'
+branch_labels = None
+depends_on = None
+
+
+def rating_columns():
+    return [
+        sa.Column('average_rating', sa.Numeric(precision=3, scale=2), nullable=False),
+        sa.Column('review_count', sa.Integer(), nullable=False),
+        sa.Column('rating_sum', sa.Integer(), nullable=False),
+        sa.Column('stars_1', sa.Integer(), nullable=False),
+        sa.Column('stars_2', sa.Integer(), nullable=False),
+        sa.Column('stars_3', sa.Integer(), nullable=False),
+        sa.Column('stars_4', sa.Integer(), nullable=False),
+        sa.Column('stars_5', sa.Integer(), nullable=False),
+    ]
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    tables = set(inspector.get_table_names())
+
+    if 'salon_ratings' not in tables:
+        op.create_table('salon_ratings',
+        sa.Column('salon_id', sa.Integer(), nullable=False),
+        *rating_columns(),
+        sa.ForeignKeyConstraint(['salon_id'], ['salons.salon_id'], ),
+        sa.PrimaryKeyConstraint('salon_id')
+        )
+
+    if 'staff_ratings' not in tables:
+        op.create_table('staff_ratings',
+        sa.Column('staff_id', sa.Integer(), nullable=False),
+        *rating_columns(),
+        sa.ForeignKeyConstraint(['staff_id'], ['staff.staff_id'], ),
+        sa.PrimaryKeyConstraint('staff_id')
+        )
+
+
+def downgrade():
+    op.drop_table('staff_ratings')
+    op.drop_table('salon_ratings')
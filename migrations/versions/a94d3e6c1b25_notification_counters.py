@@ -0,0 +1,38 @@
+"""per-user unread notification counters
+
+Revision ID: a94d3e6c1b25
+Revises: e2a7f4b90c18
+Create Date: 2026-10-18 00:45:00.000000
+
+Counters are backfilled from the notifications already stored.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a94d3e6c1b25'
+down_revision = 'e2a7f4b90c18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('notification_counters',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('unread', sa.Integer(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+
+    op.execute(
+        "INSERT INTO notification_counters (user_id, unread, version) "
+        "SELECT user_id, SUM(CASE WHEN is_read = 0 THEN 1 ELSE 0 END), 0 "
+        "FROM notifications GROUP BY user_id"
+    )
+
+
+def downgrade():
+    op.drop_table('notification_counters')
@@ -0,0 +1,37 @@
+"""appointment reschedule audit rows
+
+Revision ID: b7c2e9d40f16
+Revises: d3f8a6b15c72
+Create Date: 2026-10-18 09:30:00.000000
+
+The metrics rollup reads previous_scheduled_time to recompute the day a
+booking was moved away from.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7c2e9d40f16'
+down_revision = 'd3f8a6b15c72'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('appointment_reschedules',
+    sa.Column('reschedule_id', sa.Integer(), nullable=False),
+    sa.Column('appointment_id', sa.Integer(), nullable=False),
+    sa.Column('previous_scheduled_time', sa.DateTime(), nullable=False),
+    sa.Column('scheduled_time', sa.DateTime(), nullable=False),
+    sa.Column('rescheduled_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['appointment_id'], ['appointments.appointment_id'], ),
+    sa.PrimaryKeyConstraint('reschedule_id')
+    )
+    op.create_index(op.f('ix_appointment_reschedules_rescheduled_at'), 'appointment_reschedules', ['rescheduled_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_appointment_reschedules_rescheduled_at'), table_name='appointment_reschedules')
+    op.drop_table('appointment_reschedules')
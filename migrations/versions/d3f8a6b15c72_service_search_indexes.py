@@ -0,0 +1,31 @@
+"""ngram full-text and price indexes for service search
+
+Revision ID: d3f8a6b15c72
+Revises: a94d3e6c1b25
+Create Date: 2026-10-18 01:10:00.000000
+
+The FULLTEXT ... WITH PARSER ngram indexes need MySQL 5.7.6 or later;
+other databases get plain indexes on the same columns.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd3f8a6b15c72'
+down_revision = 'a94d3e6c1b25'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ft_services_name_description', 'services', ['custom_name', 'description'], unique=False, mysql_prefix='FULLTEXT', mysql_with_parser='ngram')
+    op.create_index('ft_service_categories_name', 'service_categories', ['name'], unique=False, mysql_prefix='FULLTEXT', mysql_with_parser='ngram')
+    op.create_index('idx_services_active_price', 'services', ['is_active', 'price', 'service_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('idx_services_active_price', table_name='services')
+    op.drop_index('ft_service_categories_name', table_name='service_categories')
+    op.drop_index('ft_services_name_description', table_name='services')
@@ -0,0 +1,90 @@
+"""loyalty ledger, unique loyalty balance per user and salon
+
+Revision ID: e2a7f4b90c18
+Revises: c51d8a0f3e97
+Create Date: 2026-10-18 00:20:00.000000
+
+Duplicate (user_id, salon_id) balances are merged into the oldest row
+before the unique key is added, and every existing balance gets an opening
+'adjustment' ledger entry so ledger sums match the loyalty table.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2a7f4b90c18'
+down_revision = 'c51d8a0f3e97'
+branch_labels = None
+depends_on = None
+
+
+def merge_duplicate_balances(bind):
+    duplicates = bind.execute(sa.text(
+        "SELECT user_id, salon_id, MIN(loyalty_id), SUM(points), SUM(lifetime_points), "
+        "MAX(last_earned) FROM loyalty GROUP BY user_id, salon_id HAVING COUNT(*) > 1"
+    )).fetchall()
+    for user_id, salon_id, keep_id, points, lifetime, last_earned in duplicates:
+        bind.execute(sa.text(
+            "UPDATE loyalty SET points = :points, lifetime_points = :lifetime, "
+            "last_earned = :last_earned WHERE loyalty_id = :keep_id"
+        ), dict(points=points, lifetime=lifetime, last_earned=last_earned, keep_id=keep_id))
+        bind.execute(sa.text(
+            "DELETE FROM loyalty WHERE user_id = :user_id AND salon_id = :salon_id "
+            "AND loyalty_id != :keep_id"
+        ), dict(user_id=user_id, salon_id=salon_id, keep_id=keep_id))
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    columns = {c['name'] for c in inspector.get_columns('salon_settings')}
+    with op.batch_alter_table('salon_settings', schema=None) as batch_op:
+        if 'loyalty_points_per_dollar' not in columns:
+            batch_op.add_column(sa.Column('loyalty_points_per_dollar', sa.Integer(), nullable=True))
+        if 'loyalty_redemption_rate' not in columns:
+            batch_op.add_column(sa.Column('loyalty_redemption_rate', sa.Numeric(precision=6, scale=4), nullable=True))
+
+    merge_duplicate_balances(bind)
+    with op.batch_alter_table('loyalty', schema=None) as batch_op:
+        batch_op.create_unique_constraint('unique_loyalty_user_salon', ['user_id', 'salon_id'])
+
+    op.create_table('loyalty_transactions',
+    sa.Column('transaction_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('salon_id', sa.Integer(), nullable=False),
+    sa.Column('points', sa.Integer(), nullable=False),
+    sa.Column('reason', sa.Enum('appointment', 'purchase', 'redemption', 'adjustment'), nullable=False),
+    sa.Column('reference_id', sa.Integer(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['salon_id'], ['salons.salon_id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ),
+    sa.PrimaryKeyConstraint('transaction_id')
+    )
+    op.create_index('idx_loyalty_txn_user_salon', 'loyalty_transactions', ['user_id', 'salon_id', 'created_at'], unique=False)
+    op.create_index('ix_loyalty_transactions_created_at', 'loyalty_transactions', ['created_at'], unique=False)
+
+    bind.execute(sa.text(
+        "INSERT INTO loyalty_transactions (user_id, salon_id, points, reason, created_at) "
+        "SELECT user_id, salon_id, points, 'adjustment', CURRENT_TIMESTAMP "
+        "FROM loyalty WHERE points != 0"
+    ))
+
+
+def downgrade():
+    bind = op.get_bind()
+    op.drop_index('ix_loyalty_transactions_created_at', table_name='loyalty_transactions')
+    op.drop_index('idx_loyalty_txn_user_salon', table_name='loyalty_transactions')
+    op.drop_table('loyalty_transactions')
+
+    with op.batch_alter_table('loyalty', schema=None) as batch_op:
+        if bind.dialect.name == 'mysql':
+            # The user_id FK needs an index once the key is gone
+            batch_op.create_index('user_id', ['user_id'], unique=False)
+        batch_op.drop_constraint('unique_loyalty_user_salon', type_='unique')
+
+    with op.batch_alter_table('salon_settings', schema=None) as batch_op:
+        batch_op.drop_column('loyalty_redemption_rate')
+        batch_op.drop_column('loyalty_points_per_dollar')
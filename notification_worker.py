@@ -0,0 +1,139 @@
+# notification_worker.py Notification queue worker
+#
+# Run with: python -m notification_worker [--batch-size N] [--poll-interval S] [--once]
+import argparse
+import logging
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from app import (
+    create_app,
+    db,
+    Notification,
+    NotificationQueue,
+    NOTIFICATION_BATCH_SIZE,
+    NOTIFICATION_MAX_ATTEMPTS,
+    NOTIFICATION_RETRY_SECONDS,
+    unread_counter_upsert,
+)
+
+log = logging.getLogger("notification_worker")
+
+
+def claim_due_entries(batch_size):
+    """Lock a batch of due queue rows, skipping rows held by other workers"""
+    return (
+        NotificationQueue.query.filter(
+            NotificationQueue.sent == False,
+            NotificationQueue.scheduled_for <= datetime.utcnow(),
+            NotificationQueue.attempts < NOTIFICATION_MAX_ATTEMPTS,
+        )
+        .order_by(NotificationQueue.scheduled_for)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+
+
+def notification_row(entry, now):
+    return {
+        "user_id": entry.user_id,
+        "type": entry.type,
+        "message": entry.message,
+        "is_read": False,
+        "sent_at": now,
+        "scheduled_for": entry.scheduled_for,
+    }
+
+
+def process_batch(batch_size):
+    """Materialize one batch of due queue entries. Returns rows processed."""
+    entries = claim_due_entries(batch_size)
+    if not entries:
+        db.session.commit()
+        return 0
+
+    now = datetime.utcnow()
+    stmt = Notification.__table__.insert()
+
+    try:
+        with db.session.begin_nested():
+            db.session.execute(stmt, [notification_row(e, now) for e in entries])
+        for entry in entries:
+            entry.sent = True
+    except SQLAlchemyError:
+        # Retry row by row so one bad entry doesn't hold back the batch
+        for entry in entries:
+            try:
+                with db.session.begin_nested():
+                    db.session.execute(stmt, [notification_row(entry, now)])
+                entry.sent = True
+            except SQLAlchemyError as e:
+                entry.attempts = (entry.attempts or 0) + 1
+                entry.last_error = str(e)[:1000]
+                entry.scheduled_for = now + timedelta(
+                    seconds=NOTIFICATION_RETRY_SECONDS * 2 ** (entry.attempts - 1)
+                )
+                if entry.attempts >= NOTIFICATION_MAX_ATTEMPTS:
+                    # Never claimed again; it stays unsent with last_error set
+                    log.error(
+                        "queue entry %s for user %s dead-lettered after %s attempts: %s",
+                        entry.queue_id,
+                        entry.user_id,
+                        entry.attempts,
+                        e,
+                    )
+                else:
+                    log.warning(
+                        "queue entry %s failed (attempt %s): %s",
+                        entry.queue_id,
+                        entry.attempts,
+                        e,
+                    )
+
+    delivered = Counter(entry.user_id for entry in entries if entry.sent)
+    if delivered:
+        db.session.execute(unread_counter_upsert(delivered))
+    db.session.commit()
+    return len(entries)
+
+
+def run(batch_size, poll_interval, once=False):
+    """Poll the queue until interrupted (or until drained with once=True)"""
+    with create_app().app_context():
+        while True:
+            try:
+                processed = process_batch(batch_size)
+            except SQLAlchemyError:
+                db.session.rollback()
+                log.exception("queue poll failed")
+                processed = 0
+
+            if processed:
+                log.info("delivered %s queued notifications", processed)
+            if processed < batch_size:
+                if once:
+                    return
+                time.sleep(poll_interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Deliver queued notifications")
+    parser.add_argument("--batch-size", type=int, default=NOTIFICATION_BATCH_SIZE)
+    parser.add_argument("--poll-interval", type=float, default=2.0)
+    parser.add_argument(
+        "--once", action="store_true", help="exit once the queue is drained"
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s"
+    )
+    run(args.batch_size, args.poll_interval, once=args.once)
+
+
+if __name__ == "__main__":
+    main()
@@ -325,10 +325,13 @@ CREATE TABLE notification_tracking (
 CREATE TABLE notification_queue (
     queue_id INT AUTO_INCREMENT PRIMARY KEY,
     user_id INT NOT NULL,
+    type ENUM('reminder','promotion','status_update','discount') NOT NULL DEFAULT 'status_update',
     message TEXT NOT NULL,
     delivery_method ENUM('email','sms','push') DEFAULT 'email',
     scheduled_for DATETIME NOT NULL,
     sent BOOLEAN DEFAULT FALSE,
+    attempts INT DEFAULT 0,
+    last_error TEXT,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE,
     INDEX idx_notif_queue_user (user_id),
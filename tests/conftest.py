@@ -0,0 +1,26 @@
+import os
+
+import pytest
+
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+from app import create_app, db, identity_cache  # noqa: E402
+
+
+@pytest.fixture
+def app(tmp_path):
+    """App on a file-backed SQLite database; each request thread gets its own connection"""
+    app = create_app(
+        {
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'salon.db'}",
+            "UPLOAD_FOLDER": str(tmp_path / "uploads"),
+            "JWT_SECRET_KEY": "test-secret-key-that-is-long-enough",
+        }
+    )
+    with app.app_context():
+        db.create_all()
+    identity_cache.clear()
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
@@ -0,0 +1,109 @@
+"""Data builders and request helpers shared by the tests"""
+import threading
+from datetime import time
+from decimal import Decimal
+
+from sqlalchemy import event
+
+from app import (
+    Salon,
+    Service,
+    ServiceCategory,
+    Staff,
+    StaffAvailability,
+    User,
+    WEEKDAYS,
+    create_access_token,
+    db,
+)
+
+
+def add_user(role, name):
+    user = User(full_name=name, phone=name, email=f"{name}@example.com", user_role=role)
+    db.session.add(user)
+    db.session.flush()
+    return user
+
+
+def add_salon(owner_name="owner"):
+    """An active salon with one 30 minute service"""
+    owner = add_user("owner", owner_name)
+    salon = Salon(owner_id=owner.user_id, name=f"{owner_name} salon", status="active")
+    db.session.add(salon)
+    db.session.flush()
+    category = ServiceCategory(salon_id=salon.salon_id, name="Hair")
+    db.session.add(category)
+    db.session.flush()
+    service = Service(
+        salon_id=salon.salon_id,
+        category_id=category.category_id,
+        custom_name="Cut",
+        duration=30,
+        price=Decimal("20"),
+    )
+    db.session.add(service)
+    db.session.flush()
+    return salon, service
+
+
+def add_staff(salon, name):
+    """A staff member working 09:00-17:00 every day"""
+    staff = Staff(salon_id=salon.salon_id, user_id=add_user("staff", name).user_id)
+    db.session.add(staff)
+    db.session.flush()
+    db.session.add_all(
+        StaffAvailability(
+            staff_id=staff.staff_id,
+            day_of_week=day,
+            start_time=time(9),
+            end_time=time(17),
+        )
+        for day in WEEKDAYS
+    )
+    return staff
+
+
+def auth(user_id):
+    return {"Authorization": f"Bearer {create_access_token(identity=str(user_id))}"}
+
+
+def run_concurrently(app, calls):
+    """Run (method, path, json, headers) requests on parallel threads.
+
+    A barrier releases every thread at once; returns the responses in
+    the order of calls.
+    """
+    barrier = threading.Barrier(len(calls))
+    responses = [None] * len(calls)
+
+    def worker(i, method, path, body, headers):
+        client = app.test_client()
+        barrier.wait()
+        responses[i] = getattr(client, method)(path, json=body, headers=headers)
+
+    threads = [
+        threading.Thread(target=worker, args=(i, *call)) for i, call in enumerate(calls)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return responses
+
+
+def count_queries(app, path, headers=None):
+    """Statements one GET sends to the database, counted by a cursor listener"""
+    with app.app_context():
+        engine = db.engine
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        response = app.test_client().get(path, headers=headers)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    assert response.status_code == 200, response.get_json()
+    return len(statements)
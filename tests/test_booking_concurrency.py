@@ -0,0 +1,54 @@
+from datetime import datetime
+
+from app import Appointment, db
+from helpers import add_salon, add_staff, add_user, auth, run_concurrently
+
+SLOT = "2030-01-07T10:00:00"
+THREADS = 8
+
+
+def test_one_booking_wins_a_contested_slot(app):
+    with app.app_context():
+        salon, service = add_salon()
+        staff = add_staff(salon, "barber")
+        customers = [add_user("customer", f"customer{i}") for i in range(THREADS)]
+        db.session.commit()
+        body = {
+            "salon_id": salon.salon_id,
+            "service_id": service.service_id,
+            "staff_id": staff.staff_id,
+            "scheduled_time": SLOT,
+        }
+        calls = [("post", "/appointments", body, auth(c.user_id)) for c in customers]
+        staff_id = staff.staff_id
+
+    responses = run_concurrently(app, calls)
+
+    codes = sorted(r.status_code for r in responses)
+    assert codes == [201] + [409] * (THREADS - 1)
+    with app.app_context():
+        booked = Appointment.query.filter_by(staff_id=staff_id).all()
+        assert [a.scheduled_time for a in booked] == [datetime.fromisoformat(SLOT)]
+
+
+def test_bookings_for_different_staff_all_succeed(app):
+    with app.app_context():
+        salon, service = add_salon()
+        calls = []
+        for i in range(THREADS):
+            staff = add_staff(salon, f"barber{i}")
+            customer = add_user("customer", f"customer{i}")
+            body = {
+                "salon_id": salon.salon_id,
+                "service_id": service.service_id,
+                "staff_id": staff.staff_id,
+                "scheduled_time": SLOT,
+            }
+            calls.append(("post", "/appointments", body, auth(customer.user_id)))
+        db.session.commit()
+
+    responses = run_concurrently(app, calls)
+
+    assert [r.status_code for r in responses] == [201] * THREADS
+    with app.app_context():
+        assert Appointment.query.count() == THREADS
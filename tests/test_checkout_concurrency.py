@@ -0,0 +1,55 @@
+from decimal import Decimal
+
+from sqlalchemy import text
+
+from app import Cart, CartItem, Order, Product, db
+from helpers import add_salon, add_user, auth, run_concurrently
+
+CARTS = 8
+STOCK = 3
+
+
+def test_checkouts_never_oversell_stock(app):
+    with app.app_context():
+        # Any UPDATE that would take stock below zero fails the request
+        db.session.execute(
+            text(
+                "CREATE TRIGGER products_stock_not_negative BEFORE UPDATE OF stock"
+                " ON products WHEN NEW.stock < 0"
+                " BEGIN SELECT RAISE(ABORT, 'negative stock'); END"
+            )
+        )
+        salon, _ = add_salon()
+        product = Product(
+            salon_id=salon.salon_id, name="Wax", price=Decimal("12"), stock=STOCK
+        )
+        db.session.add(product)
+        db.session.flush()
+        calls = []
+        for i in range(CARTS):
+            customer = add_user("customer", f"customer{i}")
+            cart = Cart(user_id=customer.user_id, salon_id=salon.salon_id)
+            db.session.add(cart)
+            db.session.flush()
+            db.session.add(
+                CartItem(
+                    cart_id=cart.cart_id,
+                    product_id=product.product_id,
+                    quantity=1,
+                    price=product.price,
+                    type="product",
+                )
+            )
+            body = {"cart_id": cart.cart_id}
+            calls.append(("post", "/checkout", body, auth(customer.user_id)))
+        db.session.commit()
+        product_id = product.product_id
+
+    responses = run_concurrently(app, calls)
+
+    codes = sorted(r.status_code for r in responses)
+    assert codes == [200] * STOCK + [409] * (CARTS - STOCK)
+    with app.app_context():
+        assert db.session.get(Product, product_id).stock == 0
+        assert Order.query.count() == STOCK
+        assert Cart.query.filter_by(status="checked_out").count() == STOCK
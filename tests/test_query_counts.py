@@ -0,0 +1,161 @@
+"""List endpoints must issue the same number of statements for 1 row as for many"""
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+
+from app import (
+    Appointment,
+    AppointmentService,
+    Cart,
+    CartItem,
+    Loyalty,
+    Product,
+    Review,
+    Salon,
+    Service,
+    db,
+    identity_cache,
+    invalidate_catalog,
+)
+from helpers import add_salon, add_staff, add_user, auth, count_queries
+
+MANY = 20
+FIRST_DAY = datetime(2030, 1, 7, 10)
+
+
+@pytest.fixture
+def world(app):
+    """One salon with a customer, a staff member and an active cart"""
+    with app.app_context():
+        salon, service = add_salon()
+        staff = add_staff(salon, "barber")
+        customer = add_user("customer", "customer")
+        cart = Cart(user_id=customer.user_id, salon_id=salon.salon_id)
+        db.session.add(cart)
+        db.session.commit()
+        return {
+            "salon_id": salon.salon_id,
+            "owner_id": salon.owner_id,
+            "category_id": service.category_id,
+            "staff_id": staff.staff_id,
+            "staff_user_id": staff.user_id,
+            "customer_id": customer.user_id,
+            "cart_id": cart.cart_id,
+            "rows": 0,
+        }
+
+
+def add_rows(world, n):
+    """Give every list endpoint n more rows, each pointing at its own related rows"""
+    for _ in range(n):
+        i = world["rows"] = world["rows"] + 1
+        other = add_user("owner", f"other-owner{i}")
+        other_salon = Salon(owner_id=other.user_id, name=f"salon{i}", status="active")
+        db.session.add(other_salon)
+        db.session.flush()
+
+        service = Service(
+            salon_id=world["salon_id"],
+            category_id=world["category_id"],
+            custom_name=f"service{i}",
+            duration=30,
+            price=Decimal("20"),
+        )
+        add_staff(db.session.get(Salon, world["salon_id"]), f"barber{i}")
+        product = Product(
+            salon_id=world["salon_id"], name=f"product{i}", price=Decimal("5"), stock=9
+        )
+        db.session.add_all([service, product])
+        db.session.flush()
+
+        appointment = Appointment(
+            user_id=world["customer_id"],
+            salon_id=world["salon_id"],
+            staff_id=world["staff_id"],
+            service_id=service.service_id,
+            scheduled_time=FIRST_DAY + timedelta(days=i - 1),
+            price=service.price,
+            status="completed",
+        )
+        db.session.add(appointment)
+        db.session.flush()
+        db.session.add(
+            AppointmentService(
+                appointment_id=appointment.appointment_id,
+                service_id=service.service_id,
+                duration=service.duration,
+                price=service.price,
+            )
+        )
+
+        reviewer = add_user("customer", f"reviewer{i}")
+        db.session.add_all(
+            [
+                Review(
+                    appointment_id=appointment.appointment_id,
+                    user_id=reviewer.user_id,
+                    salon_id=world["salon_id"],
+                    staff_id=world["staff_id"],
+                    rating=5,
+                ),
+                Loyalty(
+                    user_id=world["customer_id"],
+                    salon_id=other_salon.salon_id,
+                    points=i,
+                    lifetime_points=i,
+                ),
+                CartItem(
+                    cart_id=world["cart_id"],
+                    product_id=product.product_id,
+                    price=product.price,
+                    type="product",
+                ),
+                CartItem(
+                    cart_id=world["cart_id"],
+                    service_id=service.service_id,
+                    price=service.price,
+                    type="service",
+                ),
+            ]
+        )
+    db.session.commit()
+    invalidate_catalog(world["salon_id"])
+
+
+def route_query_counts(app, world):
+    days = f"from={FIRST_DAY.date()}&to={(FIRST_DAY + timedelta(days=MANY)).date()}"
+    routes = [
+        ("/salons", None),
+        (f"/salons/{world['salon_id']}/staff", None),
+        (f"/salons/{world['salon_id']}/services", None),
+        (f"/salons/{world['salon_id']}/reviews", None),
+        ("/appointments", world["customer_id"]),
+        ("/users/me/appointments", world["customer_id"]),
+        (f"/staff/{world['staff_id']}/appointments?{days}", world["staff_user_id"]),
+        (
+            f"/salons/{world['salon_id']}/customers/{world['customer_id']}/history",
+            world["owner_id"],
+        ),
+        ("/loyalty", world["customer_id"]),
+        ("/carts/active", world["customer_id"]),
+    ]
+    counts = {}
+    for path, user_id in routes:
+        identity_cache.clear()
+        with app.app_context():
+            headers = auth(user_id) if user_id else None
+        counts[path] = count_queries(app, path, headers)
+    return counts
+
+
+def test_list_endpoints_run_constant_queries(app, world):
+    with app.app_context():
+        add_rows(world, 1)
+    one = route_query_counts(app, world)
+
+    with app.app_context():
+        add_rows(world, MANY - 1)
+    many = route_query_counts(app, world)
+
+    assert many == one
@@ -0,0 +1,6 @@
+# wsgi.py Production WSGI entry point
+#
+# gunicorn -c gunicorn.conf.py (see gunicorn.conf.py), or any WSGI server: wsgi:app
+from app import create_app
+
+app = create_app()